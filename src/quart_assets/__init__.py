@@ -1,9 +1,13 @@
-from webassets.bundle import Bundle  # noqa: F401
-
 from .extension import (
+    AssetMetrics,
     assets,
     AsyncAssetsExtension,
+    AsyncFilter,
+    Bundle,
+    ChunkedFilter,
+    ContentHashUpdater,
     Jinja2Filter,
+    log_asset_metric,
     QuartAssets,
     QuartConfigStorage,
     QuartResolver,
@@ -13,10 +17,15 @@ __version__ = "0.1.7"  # x-release-please-version
 
 __all__ = (
     "assets",
+    "AssetMetrics",
     "Bundle",
     "QuartAssets",
     "QuartConfigStorage",
     "QuartResolver",
     "Jinja2Filter",
     "AsyncAssetsExtension",
+    "AsyncFilter",
+    "ChunkedFilter",
+    "ContentHashUpdater",
+    "log_asset_metric",
 )
@@ -1,23 +1,86 @@
 """Integration of the ``webassets`` library with Quart."""
 
 import asyncio
+import contextvars
+import copy
+import fnmatch
+import functools
+import glob
+import gzip
+import hashlib
 import inspect
+import json
 import logging
+import mimetypes
+import multiprocessing
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Generator, Iterable, Iterator
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import AbstractContextManager, contextmanager, nullcontext
 from os import path
 from types import ModuleType
-from typing import Any
+from typing import Any, IO
+from urllib.parse import urlsplit
+from weakref import WeakKeyDictionary, WeakSet
 
 import click
-from quart import has_app_context, has_request_context, url_for
+import webassets.bundle
+import webassets.env
+from jinja2 import Environment, nodes, Template
+from quart import (
+    before_render_template,
+    current_app,
+    has_app_context,
+    has_request_context,
+    request,
+    Response,
+    template_rendered,
+    url_for,
+)
 from quart.app import Quart
 from quart.cli import pass_script_info, ScriptInfo
 from quart.globals import app_ctx, request_ctx
-from quart.templating import render_template_string
+from webassets.bundle import _effective_debug_level, get_all_bundle_files, has_placeholder, wrap
+from webassets.cache import FilesystemCache, make_md5
 from webassets.env import BaseEnvironment, ConfigStorage, env_options, Resolver
+from webassets.exceptions import BuildError, BundleError
 from webassets.ext.jinja2 import AssetsExtension
 from webassets.filter import Filter, register_filter
 from webassets.loaders import PythonLoader, YAMLLoader
-from webassets.script import CommandLineEnvironment
+from webassets.merge import (
+    FileHunk,
+    FilterTool,
+    MemoryHunk,
+    merge,
+    merge_filters,
+    MoreThanOneFilterError,
+    NoFilters,
+    select_filters,
+    UrlHunk,
+)
+from webassets.script import BuildCommand, CommandError, CommandLineEnvironment, WatchCommand
+from webassets.updater import SKIP_CACHE, TimestampUpdater
+from webassets.utils import calculate_sri_on_file, hash_func, is_url
+from webassets.version import HashVersion
+from werkzeug.exceptions import HTTPException
+
+# Format version of the files written by ``QuartAssets.write_url_manifest``.
+URL_MANIFEST_VERSION = 1
+
+# Config keys specific to Quart-Assets. Like webassets' own ``env_options``
+# these are stored in the Quart config with an ``ASSETS_`` prefix.
+quart_env_options = [
+    "render_cache",
+    "build_executor",
+    "build_lock",
+    "sri",
+    "streaming",
+    "precompile_tags",
+]
 
 
 def get_static_folder(app_or_blueprint: Any) -> str:
@@ -29,92 +92,1270 @@ def get_static_folder(app_or_blueprint: Any) -> str:
     return app_or_blueprint.static_folder
 
 
+# The app of the current context, resolved once per render for environments
+# that are not bound to an app. See ``QuartAssets._app``.
+_context_app: contextvars.ContextVar[Quart | None] = contextvars.ContextVar(
+    "quart_assets_context_app", default=None
+)
+
+
+def _needs_app_binding(env: Any) -> bool:
+    """Whether ``env`` looks its app up in the context, which is not yet bound."""
+    return getattr(env, "app", True) is None and _context_app.get() is None
+
+
+@contextmanager
+def _binding_app(env: Any) -> Generator[None]:
+    """Resolve the current app of ``env`` once, for the duration of the block."""
+    token = _context_app.set(env._app)
+    try:
+        yield
+    finally:
+        _context_app.reset(token)
+
+
+# Source lookups shared by the bundles of an ``{% assets_many %}`` tag.
+_shared_sources: contextvars.ContextVar[dict[str, Any] | None] = contextvars.ContextVar(
+    "quart_assets_shared_sources", default=None
+)
+
+
+@contextmanager
+def _sharing_sources() -> Generator[None]:
+    """Look each source file up only once within the block."""
+    token = _shared_sources.set({})
+    try:
+        yield
+    finally:
+        _shared_sources.reset(token)
+
+
+def _bundle_files(item: Any) -> tuple[Any, ...]:
+    """Return the contents of the bundle given by an ``{% assets_many %}`` argument."""
+    if isinstance(item, (list, tuple)):
+        return tuple(item)
+    return (item,)
+
+
+def _unique_entries(results: list[tuple[Any, Any]]) -> Iterator[tuple[str, Any, Any]]:
+    """Yield ``(url, sri, extra)`` for the URLs of several bundles, each URL once."""
+    seen = set()
+    for extra, urls in results:
+        for entry in urls:
+            if isinstance(entry, dict):
+                url, sri = entry["uri"], entry.get("sri", None)
+            else:
+                url, sri = entry, None
+            if url not in seen:
+                seen.add(url)
+                yield url, sri, extra
+
+
+# The URLs rendered by ``{% assets %}`` tags during the current request, if
+# they are being collected. See ``QuartAssets.preload``.
+_preload_urls: contextvars.ContextVar[list[str] | None] = contextvars.ContextVar(
+    "quart_assets_preload_urls", default=None
+)
+
+# The ``as`` attribute of preload links, by file extension.
+PRELOAD_TYPES = {".css": "style", ".js": "script", ".mjs": "script"}
+
+
+def _collect_preload_urls(urls: Iterable[Any]) -> None:
+    """Record rendered URLs for preloading, if the current request collects them."""
+    collected = _preload_urls.get()
+    if collected is not None:
+        collected.extend(url["uri"] if isinstance(url, dict) else url for url in urls)
+
+
+def _preload_links(urls: Iterable[str]) -> tuple[str, ...]:
+    """Return ``Link`` header values preloading the stylesheets and scripts in ``urls``."""
+    links: dict[str, None] = {}
+    for url in urls:
+        kind = PRELOAD_TYPES.get(path.splitext(urlsplit(url).path)[1].lower())
+        if kind is not None:
+            links[f"<{url}>; rel=preload; as={kind}"] = None
+    return tuple(links)
+
+
+def _url_files(bundle: Any, ctx: Any, extra_filters: Any) -> Iterator[str | None]:
+    """Yield the file behind each URL of a bundle, in the order webassets
+    returns them, or ``None`` for external URLs."""
+    debug = _effective_debug_level(ctx, bundle, extra_filters)
+    if debug is not True and (bundle.filters or bundle.output):
+        yield ctx.resolver.resolve_output_to_path(ctx, bundle.output, bundle)
+        return
+    for _, cnt in bundle.resolve_contents(ctx):
+        if isinstance(cnt, webassets.bundle.Bundle):
+            filters = merge_filters(extra_filters, bundle.filters)
+            yield from _url_files(cnt, wrap(ctx, cnt), filters)
+        else:
+            yield None if is_url(cnt) else cnt
+
+
+def _urls_with_sri(env: Any, bundle: Any, urls: list[str]) -> list[dict[str, Any]]:
+    """Pair the URLs of ``bundle`` with SRI hashes from the cache of ``env``.
+
+    Like ``bundle.urls(calculate_sri=True)``, which hashes every file on
+    every call.
+    """
+    files = [
+        filename
+        for child, extra_filters, child_ctx in bundle.iterbuild(wrap(env, bundle))
+        for filename in _url_files(child, child_ctx, extra_filters)
+    ]
+    return [
+        {"uri": url, "sri": None if filename is None else env.calculate_sri(filename)}
+        for url, filename in zip(urls, files)
+    ]
+
+
+# Returned by ``_timer`` when nobody is listening for metrics.
+_NO_TIMER = nullcontext()
+
+
+def _timer(env: Any, operation: str, label: str) -> AbstractContextManager[Any]:
+    """Time the block, reporting to the metrics hooks of ``env`` (if any)."""
+    hooks = getattr(env, "_metrics_hooks", None)
+    if not hooks:
+        return _NO_TIMER
+    return _timing(hooks, operation, label)
+
+
+@contextmanager
+def _timing(hooks: tuple[Any, ...], operation: str, label: str) -> Generator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        for hook in hooks:
+            hook(operation, label, elapsed)
+
+
+class AssetMetrics:
+    """Collects the timings of asset operations as counters and histograms.
+
+    An instance is a metrics hook, see :meth:`QuartAssets.add_metrics_hook`.
+    Timings are kept per operation and label: ``"render"`` (an ``{% assets
+    %}`` tag, by output or bundle names), ``"build"`` (by output),
+    ``"filter"`` (by method and filter names), ``"resolve"`` and ``"url"``
+    (resolver calls, by item) and ``"sri"`` (hashing, by file).
+    """
+
+    #: Upper bounds of the histogram buckets, in seconds.
+    buckets = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # (operation, label) -> [count, total, max, *bucket counts]
+        self._series: dict[tuple[str, str], list[Any]] = {}
+
+    def __call__(self, operation: str, label: str, seconds: float) -> None:
+        with self._lock:
+            series = self._series.get((operation, label))
+            if series is None:
+                series = self._series[operation, label] = [0, 0.0, 0.0] + [0] * len(self.buckets)
+            series[0] += 1
+            series[1] += seconds
+            series[2] = max(series[2], seconds)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[3 + i] += 1
+                    break
+
+    def reset(self) -> None:
+        """Forget all timings."""
+        with self._lock:
+            self._series.clear()
+
+    def hot_spots(self, limit: int | None = None) -> list[dict[str, Any]]:
+        """Return the timings per operation and label, most total time first."""
+        with self._lock:
+            series = list(self._series.items())
+        series.sort(key=lambda item: item[1][1], reverse=True)
+        return [
+            {
+                "operation": operation,
+                "label": label,
+                "count": values[0],
+                "total": values[1],
+                "mean": values[1] / values[0],
+                "max": values[2],
+            }
+            for (operation, label), values in series[:limit]
+        ]
+
+    def prometheus(self, name: str = "quart_assets_operation_seconds") -> str:
+        """Return the histograms in the Prometheus text exposition format."""
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        lines = [f"# TYPE {name} histogram"]
+        for (operation, label), values in series:
+            escaped = label.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            labels = f'operation="{operation}",label="{escaped}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, values[3:]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {values[0]}')
+            lines.append(f"{name}_sum{{{labels}}} {values[1]}")
+            lines.append(f"{name}_count{{{labels}}} {values[0]}")
+        return "\n".join(lines) + "\n"
+
+
+_metrics_logger = logging.getLogger("quart_assets.metrics")
+
+
+def log_asset_metric(operation: str, label: str, seconds: float) -> None:
+    """A metrics hook which logs each timing as a structured log record.
+
+    Records go to the ``quart_assets.metrics`` logger at ``DEBUG`` level,
+    with ``operation``, ``label`` and ``seconds`` attributes.
+    """
+    _metrics_logger.debug(
+        "%s %s took %.6fs",
+        operation,
+        label,
+        seconds,
+        extra={"operation": operation, "label": label, "seconds": seconds},
+    )
+
+
+def _freeze(value: Any) -> Any:
+    """Return a hashable copy of a template tag argument.
+
+    Lists and tuples become tuples; strings, numbers, booleans and ``None``
+    are returned unchanged. Anything else (bundle or filter instances, for
+    example) cannot be used as a cache key and raises :class:`TypeError`.
+    """
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    raise TypeError(f"Cannot use {value!r} as a cache key")
+
+
 class AsyncAssetsExtension(AssetsExtension):
-    """Async-aware webassets Jinja2 extension for Quart's async Jinja environment."""
+    """Async-aware webassets Jinja2 extension for Quart's async Jinja environment.
+
+    Besides ``{% assets %}``, provides ``{% assets_many %}``, which renders
+    its body for the URLs of several bundles, resolved in a single pass::
+
+        {% assets_many "css_core", "css_theme" %}
+            <link rel="stylesheet" href="{{ ASSET_URL }}">
+        {% endassets_many %}
+    """
+
+    tags = {"assets", "assets_many"}
+
+    def parse(self, parser: Any) -> Any:
+        if parser.stream.current.value == "assets_many":
+            call_block = self._parse_many(parser)
+        else:
+            call_block = super().parse(parser)
+        # SRI hashes are only computed for tags whose body might use them.
+        uses_sri = any(
+            isinstance(node, nodes.Include) or (node.name == "ASSET_SRI" and node.ctx == "load")
+            for statement in call_block.body
+            for node in statement.find_all((nodes.Name, nodes.Include))
+        )
+        call_block.call.kwargs.append(nodes.Keyword("sri", nodes.Const(uses_sri)))
+        if self._can_precompile():
+            precompiled = self._precompile(call_block)
+            if precompiled is not None:
+                return precompiled
+        return call_block
+
+    def _can_precompile(self) -> bool:
+        """Whether tags may be resolved while the template is being compiled."""
+        env = self.environment.assets_environment  # ty: ignore[unresolved-attribute]
+        try:
+            return bool(getattr(env, "precompile_tags", False)) and not (
+                env.debug or env.auto_build
+            )
+        except RuntimeError:
+            # An environment which is not bound to an app, outside of its context.
+            return False
+
+    def _precompile(self, call_block: Any) -> list[Any] | None:
+        """Return the output of ``call_block`` as constant nodes, if possible.
+
+        Tags whose arguments are not all literals, or whose bundles cannot be
+        resolved or have not been built yet, are left to be rendered as usual.
+        """
+        eval_ctx = nodes.EvalContext(self.environment)
+        try:
+            args = [arg.as_const(eval_ctx) for arg in call_block.call.args]
+            kwargs = {kw.key: kw.value.as_const(eval_ctx) for kw in call_block.call.kwargs}
+        except nodes.Impossible:
+            return None
+
+        try:
+            if call_block.call.node.name == "_render_assets_many":
+                tags = [(None, None, None, None, _bundle_files(item)) for item in args[0]]
+                if not self._outputs_built(tags):
+                    return None
+                entries = list(_unique_entries(self._build_bundles(*args, **kwargs)))
+            else:
+                if not self._outputs_built([args]):
+                    return None
+                extra, urls = self._build_bundle(*args, **kwargs)
+                entries = [
+                    (entry["uri"], entry.get("sri", None), extra)
+                    if isinstance(entry, dict)
+                    else (entry, None, extra)
+                    for entry in urls
+                ]
+        except (BundleError, BuildError, OSError, RuntimeError):
+            return None
+
+        env = self._get_assets_environment()
+        if kwargs.get("sri", True) and env.sri and env._get_url_manifest() is None:
+            # A missing hash may only be missing until the file is built.
+            if any(sri is None for _, sri, _ in entries):
+                return None
+
+        targets = [nodes.Name(arg.name, "store") for arg in call_block.args]
+        urls = nodes.Const(tuple(url for url, _, _ in entries))
+        output = [nodes.ExprStmt(self.call_method("_collect_preload_urls", [urls]))]
+        for url, sri, extra in entries:
+            try:
+                values = [
+                    nodes.Const.from_untrusted(value, environment=self.environment)
+                    for value in (url, sri, extra)
+                ]
+            except nodes.Impossible:
+                return None
+            scope = nodes.With(targets, values, copy.deepcopy(call_block.body))
+            output.append(scope.set_lineno(call_block.lineno))
+        return output
+
+    def _outputs_built(self, tags: list[Any]) -> bool:
+        """Whether the output files of the bundles of ``tags``, each given by
+        the tag arguments up to ``files``, all exist.
+
+        Bundles served from a URL manifest need not be built here.
+        """
+        env = self._get_assets_environment()
+        if env._get_url_manifest() is not None:
+            return True
+        for filter, output, dbg, depends, files in tags:
+            bundle = self._named_bundle(env, filter, output, dbg, depends, files)
+            if bundle is None:
+                bundle = self._tag_bundle(env, filter, output, dbg, depends, files)
+            for filename in _bundle_paths(env, bundle)[1]:
+                # Versioned outputs are looked up in the manifest instead.
+                if not has_placeholder(filename) and not path.isfile(filename):
+                    return False
+        return True
+
+    def _parse_many(self, parser: Any) -> Any:
+        """Parse an ``{% assets_many %}`` tag, whose arguments are each a bundle."""
+        lineno = next(parser.stream).lineno
+        bundles = []
+        while parser.stream.current.type != "block_end":
+            if bundles:
+                parser.stream.expect("comma")
+            bundles.append(parser.parse_expression())
+
+        body = parser.parse_statements(("name:endassets_many",), drop_needle=True)
+        args = [
+            nodes.Name("ASSET_URL", "param"),
+            nodes.Name("ASSET_SRI", "param"),
+            nodes.Name("EXTRA", "param"),
+        ]
+        call = self.call_method("_render_assets_many", args=[nodes.List(bundles)])
+        call_block = nodes.CallBlock(call, args, [], body)
+        call_block.set_lineno(lineno)
+        return call_block
+
+    @staticmethod
+    def _collect_preload_urls(urls: tuple[str, ...]) -> None:
+        """Record the URLs of a precompiled tag when it is rendered."""
+        _collect_preload_urls(urls)
 
     def _render_assets(
-        self, filter: Any, output: Any, dbg: Any, depends: Any, files: Any, caller: Any = None
+        self,
+        filter: Any,
+        output: Any,
+        dbg: Any,
+        depends: Any,
+        files: Any,
+        caller: Any = None,
+        sri: bool = True,
     ) -> Any:
         if self.environment.is_async:
-            return self._render_assets_async(filter, output, dbg, depends, files, caller)
-        return self._render_assets_sync(filter, output, dbg, depends, files, caller)
+            return self._render_assets_async(filter, output, dbg, depends, files, caller, sri)
+        return self._render_assets_sync(filter, output, dbg, depends, files, caller, sri)
 
-    def _build_bundle(
-        self, filter: Any, output: Any, dbg: Any, depends: Any, files: Any
-    ) -> tuple[Any, Any]:
+    def _get_assets_environment(self) -> Any:
         env = self.environment.assets_environment  # ty: ignore[unresolved-attribute]
         if env is None:
             raise RuntimeError("No assets environment configured in Jinja2 environment")
+        return env
+
+    @staticmethod
+    def _render_key(
+        filter: Any, output: Any, dbg: Any, depends: Any, files: Any, sri: bool = True
+    ) -> Any:
+        """Return a hashable key for the tag arguments, or ``None``."""
+        try:
+            return _freeze((filter, output, dbg, depends, files, sri))
+        except TypeError:
+            return None
 
+    @staticmethod
+    def _named_bundle(
+        env: Any, filter: Any, output: Any, dbg: Any, depends: Any, files: Any
+    ) -> Any:
+        """Return the registered bundle a tag names, if it names a single one
+        and nothing else, which the tag then uses directly."""
+        if filter is None and output is None and dbg is None and depends is None:
+            if len(files) == 1 and isinstance(files[0], str):
+                return env._named_bundles.get(files[0])
+        return None
+
+    def _tag_bundle(
+        self, env: Any, filter: Any, output: Any, dbg: Any, depends: Any, files: Any
+    ) -> Any:
+        """Return a new bundle for the tag arguments."""
         bundle_kwargs = {
             "output": output,
             "filters": filter,
             "debug": dbg,
             "depends": depends,
         }
-        bundle = self.BundleClass(*self.resolve_contents(files, env), **bundle_kwargs)
+        return self.BundleClass(*self.resolve_contents(files, env), **bundle_kwargs)
 
-        with bundle.bind(env):
-            urls = bundle.urls(calculate_sri=True)
-        return bundle, urls
+    def _build_bundle(
+        self, filter: Any, output: Any, dbg: Any, depends: Any, files: Any, sri: bool = True
+    ) -> tuple[Any, Any]:
+        """Return the ``extra`` dict and the URLs for the tag arguments.
+
+        SRI hashes are only calculated if ``sri`` is set and the
+        environment's ``sri`` option is enabled.
+        """
+        env = self._get_assets_environment()
+        if _needs_app_binding(env):
+            with _binding_app(env):
+                return self._build_bundle(filter, output, dbg, depends, files, sri)
+
+        url_manifest = env._get_url_manifest()
+        if url_manifest is not None:
+            return self._urls_from_manifest(url_manifest, filter, output, dbg, depends, files)
+
+        sri = sri and env.sri
+        named = self._named_bundle(env, filter, output, dbg, depends, files)
+
+        cache = key = None
+        if env.use_render_cache():
+            if named is not None:
+                key = (files[0], sri)
+            else:
+                key = self._render_key(filter, output, dbg, depends, files, sri)
+            if key is not None:
+                cache = env._get_render_cache()
+                if key in cache:
+                    return cache[key]
+
+        if named is not None:
+            bundle = named
+            label = files[0]
+        else:
+            bundle = self._tag_bundle(env, filter, output, dbg, depends, files)
+            label = output or ",".join(str(item) for item in files)
+
+        # Registered bundles are normally bound to the environment already.
+        binding = nullcontext() if bundle._env is env else bundle.bind(env)
+        with binding, _timer(env, "render", label):
+            urls = bundle.urls(calculate_sri=False)
+            if sri:
+                urls = _urls_with_sri(env, bundle, urls)
+
+        if cache is not None:
+            cache[key] = bundle.extra, urls
+        return bundle.extra, urls
+
+    def _build_bundles(self, bundles: list[Any], sri: bool = True) -> list[tuple[Any, Any]]:
+        """Return the ``extra`` dict and the URLs of each of ``bundles``.
+
+        The bundles are resolved in a single pass, which looks the app up
+        once and each source file once, however many bundles share it.
+        """
+        env = self._get_assets_environment()
+        if _needs_app_binding(env):
+            with _binding_app(env):
+                return self._build_bundles(bundles, sri)
+
+        with _sharing_sources():
+            return [
+                self._build_bundle(None, None, None, None, _bundle_files(item), sri)
+                for item in bundles
+            ]
+
+    async def _build_bundles_async(
+        self, bundles: list[Any], sri: bool = True
+    ) -> list[tuple[Any, Any]]:
+        """Run :meth:`_build_bundles`, building the bundles concurrently."""
+        env = self._get_assets_environment()
+        if _needs_app_binding(env):
+            with _binding_app(env):
+                return await self._build_bundles_async(bundles, sri)
+
+        with _sharing_sources():
+            return await asyncio.gather(
+                *(
+                    self._build_bundle_async(None, None, None, None, _bundle_files(item), sri)
+                    for item in bundles
+                )
+            )
+
+    @staticmethod
+    def _urls_from_manifest(
+        url_manifest: dict[str, Any], filter: Any, output: Any, dbg: Any, depends: Any, files: Any
+    ) -> tuple[Any, Any]:
+        """Look the named bundles up in a precomputed URL manifest."""
+        if filter is not None or output is not None or dbg is not None or depends is not None:
+            raise BundleError("Template-defined bundles cannot be served from a URL manifest")
+
+        extra: dict[str, Any] = {}
+        urls = []
+        for name in files:
+            try:
+                entry = url_manifest[name]
+            except (KeyError, TypeError):
+                raise BundleError(f"Bundle {name!r} is not in the URL manifest") from None
+            extra.update(entry["extra"])
+            urls.extend({"uri": url["url"], "sri": url["sri"]} for url in entry["urls"])
+        return extra, urls
+
+    async def _build_bundle_async(
+        self, filter: Any, output: Any, dbg: Any, depends: Any, files: Any, sri: bool = True
+    ) -> tuple[Any, Any]:
+        """Run :meth:`_build_bundle` without blocking the event loop.
+
+        With ``auto_build`` enabled a render may have to build the bundle, so
+        the work is handed to the environment's build executor. Concurrent
+        renders of the same tag share a single build and all await its result;
+        other tags building the same output wait for that build to finish.
+        """
+        env = self._get_assets_environment()
+        if _needs_app_binding(env):
+            with _binding_app(env):
+                return await self._build_bundle_async(filter, output, dbg, depends, files, sri)
+
+        executor = None
+        if env.auto_build and env._get_url_manifest() is None:
+            executor = env._get_build_executor()
+        if executor is None:
+            return self._build_bundle(filter, output, dbg, depends, files, sri)
+
+        loop = asyncio.get_running_loop()
+        # Copy the context so the worker thread sees the current app/request.
+        call = functools.partial(
+            contextvars.copy_context().run,
+            self._build_bundle,
+            filter,
+            output,
+            dbg,
+            depends,
+            files,
+            sri,
+        )
+        key = self._render_key(filter, output, dbg, depends, files, sri)
+        target = self._output_path(env, output, files)
+        if target is not None:
+            pending_key = (loop, env._app, target)
+        elif key is not None:
+            pending_key = (loop, env._app, key)
+        else:
+            return await loop.run_in_executor(executor, call)
+
+        pending = env._pending_builds.get(pending_key)
+        while pending is not None and (key is None or pending[0] != key):
+            # Another tag is building the same output; wait for it to finish
+            # (without cancelling it), after which the output is up to date.
+            await asyncio.wait([pending[1]])
+            pending = env._pending_builds.get(pending_key)
+        if pending is None:
+            pending = (key, loop.run_in_executor(executor, call))
+            env._pending_builds[pending_key] = pending
+            pending[1].add_done_callback(lambda _: env._pending_builds.pop(pending_key, None))
+        # Shield the shared build from the cancellation of a single request.
+        return await asyncio.shield(pending[1])
+
+    @staticmethod
+    def _output_path(env: Any, output: Any, files: Any) -> str | None:
+        """Return the path a tag builds its output to, or ``None``."""
+        if output is None and len(files) == 1 and isinstance(files[0], str):
+            named = env._named_bundles.get(files[0])
+            if named is not None:
+                output = named.output
+        if not isinstance(output, str):
+            return None
+        return path.normpath(env.resolver.resolve_output_to_path(env, output, None))
 
     def _render_assets_sync(
-        self, filter: Any, output: Any, dbg: Any, depends: Any, files: Any, caller: Any
+        self,
+        filter: Any,
+        output: Any,
+        dbg: Any,
+        depends: Any,
+        files: Any,
+        caller: Any,
+        sri: bool = True,
     ) -> str:
-        bundle, urls = self._build_bundle(filter, output, dbg, depends, files)
+        extra, urls = self._build_bundle(filter, output, dbg, depends, files, sri)
+        _collect_preload_urls(urls)
         parts: list[str] = []
         for entry in urls:
             if isinstance(entry, dict):
-                parts.append(caller(entry["uri"], entry.get("sri", None), bundle.extra))
+                parts.append(caller(entry["uri"], entry.get("sri", None), extra))
             else:
-                parts.append(caller(entry, None, bundle.extra))
+                parts.append(caller(entry, None, extra))
         return "".join(parts)
 
     async def _render_assets_async(
-        self, filter: Any, output: Any, dbg: Any, depends: Any, files: Any, caller: Any
+        self,
+        filter: Any,
+        output: Any,
+        dbg: Any,
+        depends: Any,
+        files: Any,
+        caller: Any,
+        sri: bool = True,
     ) -> str:
-        bundle, urls = self._build_bundle(filter, output, dbg, depends, files)
+        extra, urls = await self._build_bundle_async(filter, output, dbg, depends, files, sri)
+        _collect_preload_urls(urls)
         parts: list[str] = []
         for entry in urls:
             if isinstance(entry, dict):
-                caller_result = caller(entry["uri"], entry.get("sri", None), bundle.extra)
+                caller_result = caller(entry["uri"], entry.get("sri", None), extra)
             else:
-                caller_result = caller(entry, None, bundle.extra)
+                caller_result = caller(entry, None, extra)
             if inspect.iscoroutine(caller_result):
                 caller_result = await caller_result
             parts.append(caller_result)
         return "".join(parts)
 
+    def _render_assets_many(self, bundles: list[Any], caller: Any = None, sri: bool = True) -> Any:
+        if self.environment.is_async:
+            return self._render_assets_many_async(bundles, caller, sri)
+        results = self._build_bundles(bundles, sri)
+        for _, urls in results:
+            _collect_preload_urls(urls)
+        return "".join(
+            caller(url, entry_sri, extra) for url, entry_sri, extra in _unique_entries(results)
+        )
 
-class Jinja2Filter(Filter):
-    """Compiles all source files as Jinja2 templates using Quart contexts."""
+    async def _render_assets_many_async(self, bundles: list[Any], caller: Any, sri: bool) -> str:
+        results = await self._build_bundles_async(bundles, sri)
+        for _, urls in results:
+            _collect_preload_urls(urls)
+        parts: list[str] = []
+        for url, entry_sri, extra in _unique_entries(results):
+            caller_result = caller(url, entry_sri, extra)
+            if inspect.iscoroutine(caller_result):
+                caller_result = await caller_result
+            parts.append(caller_result)
+        return "".join(parts)
+
+
+# Worker pools shared by all filters, created on first use. A forked process
+# creates its own, as the threads of its parent do not survive the fork.
+_filter_pools: dict[str, tuple[int, Executor]] = {}
+_filter_pools_lock = threading.Lock()
+_filter_cache_lock = threading.Lock()
+_filter_log = logging.getLogger("webassets.debug")
+
+
+def _get_filter_pool(kind: str) -> Executor:
+    """Return the shared ``"thread"`` or ``"process"`` pool for filters."""
+    pid = os.getpid()
+    with _filter_pools_lock:
+        entry = _filter_pools.get(kind)
+        if entry is None or entry[0] != pid:
+            if kind == "process":
+                pool: Executor = ProcessPoolExecutor()
+            else:
+                pool = ThreadPoolExecutor(thread_name_prefix="quart-assets-filter")
+            entry = _filter_pools[kind] = (pid, pool)
+        return entry[1]
+
+
+def _run_coroutine(coro: Any) -> Any:
+    """Run ``coro`` to completion from synchronous code and return its result.
+
+    Raises :class:`BuildError` on the thread of a running event loop, which
+    would be blocked until the coroutine is done.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    coro.close()
+    raise BuildError(
+        "Async filters cannot run on the thread of an event loop; build the bundle "
+        "in the build executor (see QuartAssets.build_executor) or elsewhere"
+    )
+
+
+class AsyncFilter(Filter):
+    """Base class for filters implemented as coroutines.
+
+    Subclasses implement ``input_async`` and/or ``output_async``, which take
+    the same arguments as the ``input`` and ``output`` methods of a webassets
+    filter, and are awaited whenever the bundle is built. CPU-bound work can
+    be handed to a process pool with :meth:`run_in_process`.
+
+    When all input filters of a bundle are :attr:`concurrent`, its sources
+    are filtered in parallel and only joined for concatenation.
+    """
+
+    #: Whether ``input`` may process several sources at once. Synchronous
+    #: filters which keep no per-source state can also set this.
+    concurrent = True
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        # webassets only runs the steps which a filter has a method for.
+        if hasattr(cls, "input_async") and not hasattr(cls, "input"):
+            setattr(cls, "input", cls._run_input)
+        if hasattr(cls, "output_async") and not hasattr(cls, "output"):
+            setattr(cls, "output", cls._run_output)
+
+    def _run_input(self, _in: Any, out: Any, **kw: Any) -> None:
+        _run_coroutine(self.input_async(_in, out, **kw))  # ty: ignore[unresolved-attribute]
+
+    def _run_output(self, _in: Any, out: Any, **kw: Any) -> None:
+        _run_coroutine(self.output_async(_in, out, **kw))  # ty: ignore[unresolved-attribute]
+
+    async def run_in_process(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Return ``func(*args)``, computed in a shared process pool.
+
+        ``func``, its arguments and its result must all be picklable.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_filter_pool("process"), func, *args)
+
+
+class _PendingHunk(MemoryHunk):
+    """A hunk whose content is still being computed by a future."""
+
+    def __init__(self, future: Any) -> None:
+        super().__init__(None)
+        self._future = future
+
+    def data(self) -> Any:
+        return self._future.result().data()
+
+
+class ChunkedFilter(Filter):
+    """Base class for filters which process their content in chunks.
+
+    Subclasses implement ``input_chunks`` and/or ``output_chunks``, which
+    take an iterator of strings plus the keyword arguments of the ``input``
+    and ``output`` methods of a webassets filter, and yield strings. In a
+    streaming build (see :attr:`QuartAssets.streaming`) the content is passed
+    through piece by piece; otherwise it arrives as a single chunk.
+    """
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        # webassets only runs the steps which a filter has a method for.
+        if hasattr(cls, "input_chunks") and not hasattr(cls, "input"):
+            setattr(cls, "input", cls._run_input)
+        if hasattr(cls, "output_chunks") and not hasattr(cls, "output"):
+            setattr(cls, "output", cls._run_output)
+
+    def _run_input(self, _in: Any, out: Any, **kw: Any) -> None:
+        out.writelines(self.input_chunks(iter([_in.read()]), **kw))  # ty: ignore[unresolved-attribute]
+
+    def _run_output(self, _in: Any, out: Any, **kw: Any) -> None:
+        out.writelines(self.output_chunks(iter([_in.read()]), **kw))  # ty: ignore[unresolved-attribute]
+
+
+def _stream_chunk_size(ctx: Any) -> int | None:
+    """Return the chunk size if bundles are streamed in ``ctx``, else ``None``."""
+    env = ctx.environment
+    if not getattr(env, "streaming", False):
+        return None
+    return env.stream_chunk_size
+
+
+def _iter_chunks(hunk: Any, chunk_size: int) -> Iterator[str]:
+    """Yield the content of ``hunk`` in pieces of up to ``chunk_size`` characters."""
+    if isinstance(hunk, _ChunkedHunk):
+        yield from hunk.chunks()
+    elif isinstance(hunk, FileHunk):
+        try:
+            with open(hunk.filename, encoding="utf-8") as f:
+                while chunk := f.read(chunk_size):
+                    yield chunk
+        except OSError as e:
+            raise BuildError(e) from e
+    else:
+        yield hunk.data()
+
+
+class _ChunkedHunk(MemoryHunk):
+    """A hunk whose content is generated in chunks whenever it is used."""
+
+    def __init__(self, chunks: Callable[[], Iterator[str]]) -> None:
+        super().__init__(None)
+        self._chunks = chunks
+
+    def chunks(self) -> Iterator[str]:
+        return self._chunks()
+
+    def data(self) -> str:
+        return "".join(self._chunks())
+
+
+def _merge_chunked(hunks: list[Any], chunk_size: int, separator: str = "\n") -> Any:
+    """Like webassets' ``merge``, but without joining the hunks."""
+
+    def chunks() -> Iterator[str]:
+        for i, hunk in enumerate(hunks):
+            if i:
+                yield separator
+            yield from _iter_chunks(hunk, chunk_size)
+
+    return _ChunkedHunk(chunks)
+
+
+def _save_hunk(hunk: Any, filename: str) -> None:
+    """Write ``hunk`` to a temporary file which then replaces ``filename``.
+
+    The hunk of a streaming build is written as its chunks are generated.
+    """
+    chunks = hunk.chunks() if isinstance(hunk, _ChunkedHunk) else [hunk.data()]
+    with _atomic_open(filename, "w", encoding="utf-8") as f:
+        f.writelines(chunks)
+
+
+def _determine_version(versions: Any, bundle: Any, ctx: Any, hunk: Any) -> Any:
+    """Return the version of ``hunk``, hashing a streamed hunk chunk by chunk."""
+    if not isinstance(hunk, _ChunkedHunk) or not isinstance(versions, HashVersion):
+        return versions.determine_version(bundle, ctx, hunk)
+    hasher = versions.hasher()
+    for chunk in hunk.chunks():
+        hasher.update(chunk.encode("utf-8"))
+    return hasher.hexdigest()[: versions.length]
+
+
+class _ConcurrentFilterTool(FilterTool):
+    """Applies concurrent input filters to the sources of a bundle in parallel.
+
+    For those, ``apply`` returns at once with a hunk that waits for the
+    result; the hunks are only read when they are concatenated. In a
+    streaming build, chunked filters are chained lazily instead.
+    """
+
+    def __init__(
+        self, *args: Any, environment: Any = None, chunk_size: int | None = None, **kwargs: Any
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.environment = environment
+        self.chunk_size = chunk_size
+
+    def apply(self, hunk: Any, filters: Any, type: str, kwargs: Any = None) -> Any:
+        active = [f for f in filters if getattr(f, type, None)]
+        chunk_size = self.chunk_size
+        if active and chunk_size and all(hasattr(f, f"{type}_chunks") for f in active):
+            return self._apply_chunked(hunk, active, type, kwargs, chunk_size)
+        if (
+            type != "input"
+            or not active
+            or not all(getattr(f, "concurrent", False) for f in active)
+        ):
+            return super().apply(hunk, filters, type, kwargs)
+        call = functools.partial(super().apply, hunk, filters, type, kwargs)
+        future = _get_filter_pool("thread").submit(contextvars.copy_context().run, call)
+        return _PendingHunk(future)
+
+    def _apply_chunked(
+        self, hunk: Any, filters: list[Any], type: str, kwargs: Any, chunk_size: int
+    ) -> Any:
+        # Chunked results are never cached, as that would need them in full.
+        kwargs_final = {**self.kwargs, **(kwargs or {})}
+
+        def chunks() -> Iterator[str]:
+            stream = _iter_chunks(hunk, chunk_size)
+            for filter in filters:
+                stream = getattr(filter, f"{type}_chunks")(stream, **kwargs_final)
+            return stream
+
+        return _ChunkedHunk(chunks)
+
+    def _wrap_cache(self, key: Any, func: Callable[[], Any]) -> Any:
+        # Unlike these filters, webassets' caches are not made for threads.
+        if self.cache and not self.no_cache_read:
+            _filter_log.debug("Checking cache for key %s", key)
+            with _filter_cache_lock:
+                content = self.cache.get(key)
+            if content not in (False, None):
+                _filter_log.debug("Using cached result for %s", key)
+                return MemoryHunk(content)
+        filters, method = key[2], key[3]
+        label = f"{method}:{','.join(f.name or type(f).__name__ for f in filters)}"
+        with _timer(self.environment, "filter", label):
+            content = func().getvalue()
+        if self.cache:
+            _filter_log.debug("Storing result in cache with key %s", key)
+            with _filter_cache_lock:
+                self.cache.set(key, content)
+        return MemoryHunk(content)
+
+
+@contextmanager
+def _output_lock(filename: str, blocking: bool = True) -> Generator[bool]:
+    """Hold an exclusive lock on building ``filename``, shared by all processes.
+
+    The lock is taken on a hidden file next to ``filename``, which is
+    removed again on release. Yields whether the lock was acquired, which is
+    always the case if ``blocking`` is set. Where ``fcntl`` is not available
+    (on Windows) no lock is taken.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield True
+        return
+
+    directory, name = path.split(path.abspath(filename))
+    lock_filename = path.join(directory, f".{name}.lock")
+    os.makedirs(directory, exist_ok=True)
+    while True:
+        fd = os.open(lock_filename, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            yield False
+            return
+        # The previous holder may have removed the file while we waited.
+        try:
+            if path.samestat(os.fstat(fd), os.lstat(lock_filename)):
+                break
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+
+    try:
+        yield True
+    finally:
+        os.unlink(lock_filename)
+        os.close(fd)
+
+
+class Bundle(webassets.bundle.Bundle):
+    """A webassets bundle, built the way the settings of a :class:`QuartAssets`
+    environment ask for.
+
+    Concurrent input filters run in parallel (see :attr:`AsyncFilter.concurrent`),
+    outputs are replaced atomically, and with :attr:`QuartAssets.build_lock`
+    only one process builds an output at a time. The filters of nested bundles
+    run the same way, whatever their class.
+
+    Streaming builds (see :attr:`QuartAssets.streaming`) only pass content
+    through in chunks where no filter other than a :class:`ChunkedFilter`
+    handles it; any other filter, at any level, gets its content in full.
+    """
+
+    def _build(
+        self,
+        ctx: Any,
+        extra_filters: Any = None,
+        force: Any = None,
+        output: Any = None,
+        disable_cache: Any = None,
+    ) -> Any:
+        with _timer(ctx.environment, "build", str(self.output)):
+            build_lock = getattr(ctx.environment, "build_lock", None)
+            if not build_lock or output is not None or not self.output:
+                return self._build_output(ctx, extra_filters, force, output, disable_cache)
+
+            if not self._update_needed(ctx, force):
+                # Up to date: no need to wait for or to hold the lock.
+                return FileHunk(self.resolve_output(ctx, self.output))
+            target = ctx.resolver.resolve_output_to_path(ctx, self.output, self)
+            wait = force or build_lock != "stale" or not path.exists(target)
+            with _output_lock(target, blocking=wait) as locked:
+                if not locked:
+                    # Another process is building the bundle; use its last output.
+                    return FileHunk(target)
+                # If another process has just built the bundle, the updater
+                # finds it up to date.
+                return self._build_output(ctx, extra_filters, force, output, disable_cache)
+
+    def _update_needed(self, ctx: Any, force: Any) -> Any:
+        """Return whether the output has to be built, or ``SKIP_CACHE`` if
+        it has to be built without using the cache."""
+        if force:
+            return True
+        if not has_placeholder(self.output) and not path.exists(
+            self.resolve_output(ctx, self.output)
+        ):
+            return True
+        return ctx.updater.needs_rebuild(self, ctx) if ctx.updater else True
+
+    def _build_output(
+        self, ctx: Any, extra_filters: Any, force: Any, output: Any, disable_cache: Any
+    ) -> Any:
+        # Follows ``webassets.bundle.Bundle._build``, but saves atomically and
+        # hashes streamed output without joining it.
+        if not self.output:
+            raise BuildError(f"No output target found for {self}")
+
+        update_needed = self._update_needed(ctx, force)
+        if update_needed == SKIP_CACHE:
+            disable_cache = True
+        if not update_needed:
+            return FileHunk(self.resolve_output(ctx, self.output))
+
+        hunk = self._merge_and_apply(
+            ctx,
+            [self.output, self.resolve_output(ctx, version="?")],
+            force,
+            disable_cache=disable_cache,
+            extra_filters=extra_filters or [],
+        )
+        if hunk is None:
+            raise BuildError(f"Nothing to build for {self}, is empty")
+
+        if output:
+            output.write(hunk.data())
+        else:
+            if has_placeholder(self.output) and not ctx.versions:
+                raise BuildError(
+                    f'You have not set the "versions" option, but {self} uses a '
+                    "version placeholder in the output target"
+                )
+            version = None
+            if ctx.versions:
+                version = _determine_version(ctx.versions, self, ctx, hunk)
+            output_filename = self.resolve_output(ctx, version=version)
+            os.makedirs(path.dirname(output_filename), exist_ok=True)
+            _save_hunk(hunk, output_filename)
+            self.version = version
+            for encoding in getattr(ctx.environment, "_precompress_encodings", ()):
+                _precompress(ctx.cache, ctx.directory, output_filename, encoding)
+
+            if ctx.manifest:
+                ctx.manifest.remember(self, ctx, version)
+            if ctx.versions and version:
+                ctx.versions.set_version(self, ctx, output_filename, version)
+
+        if ctx.updater:
+            ctx.updater.build_done(self, ctx)
+        return hunk
+
+    def _merge_and_apply(
+        self,
+        ctx: Any,
+        output: Any,
+        force: Any,
+        parent_debug: Any = None,
+        parent_filters: Any = None,
+        extra_filters: Any = None,
+        disable_cache: Any = None,
+    ) -> Any:
+        # Follows ``webassets.bundle.Bundle._merge_and_apply``, with a filter
+        # tool and a merge that can run filters in parallel and stream.
+        return _merge_and_apply(
+            self, ctx, output, force, parent_debug, parent_filters, extra_filters, disable_cache
+        )
+
+
+def _merge_and_apply(
+    bundle: Any,
+    ctx: Any,
+    output: Any,
+    force: Any,
+    parent_debug: Any,
+    parent_filters: Any,
+    extra_filters: Any,
+    disable_cache: Any,
+) -> Any:
+    parent_filters = parent_filters or []
+    extra_filters = extra_filters or []
+    parent_debug = parent_debug if parent_debug is not None else ctx.debug
+    debug_level = _effective_debug_level(ctx, bundle, extra_filters, default=parent_debug)
+    if debug_level is True:
+        debug_level = False
+
+    filters = merge_filters(bundle.filters, extra_filters)
+    for filter in filters:
+        filter.set_context(ctx)
+        filter.setup()
+    selected_filters = select_filters(filters, debug_level)
+    filters_to_run = merge_filters(selected_filters, select_filters(parent_filters, debug_level))
+    filters_to_pass_down = merge_filters(filters, parent_filters)
+
+    resolved_contents = bundle.resolve_contents(ctx, force=True)
+    # Bundles with dependencies are not cached, as those are not in the key.
+    skip_cache = disable_cache or bool(bundle.resolve_depends(ctx))
+    chunk_size = _stream_chunk_size(ctx)
+    filtertool = _ConcurrentFilterTool(
+        ctx.cache,
+        no_cache_read=skip_cache,
+        kwargs={"output": output[0], "output_path": output[1]},
+        environment=ctx.environment,
+        chunk_size=chunk_size,
+    )
+
+    hunks = []
+    for item, cnt in resolved_contents:
+        if isinstance(cnt, webassets.bundle.Bundle):
+            hunk = _merge_and_apply(
+                cnt,
+                wrap(ctx, cnt),
+                output,
+                force,
+                debug_level,
+                filters_to_pass_down,
+                None,
+                disable_cache,
+            )
+            if hunk is not None:
+                hunks.append((hunk, {}))
+            continue
+
+        try:
+            hunk = filtertool.apply_func(
+                filters_to_run,
+                "open",
+                [cnt],
+                kwargs={"source": item},
+                cache_key=[FileHunk(cnt)] if not is_url(cnt) else [],
+            )
+        except MoreThanOneFilterError as e:
+            raise BuildError(e) from e
+        except NoFilters:
+            hunk = UrlHunk(cnt, env=ctx) if is_url(cnt) else FileHunk(cnt)
+
+        item_data = {"source": item, "source_path": cnt}
+        hunks.append((filtertool.apply(hunk, filters_to_run, "input", kwargs=item_data), item_data))
+
+    if not hunks:
+        return None
+
+    try:
+        try:
+            final = filtertool.apply_func(filters_to_run, "concat", [hunks])
+        except MoreThanOneFilterError as e:
+            raise BuildError(e) from e
+        except NoFilters:
+            if chunk_size is None:
+                final = merge([h for h, _ in hunks])
+            else:
+                final = _merge_chunked([h for h, _ in hunks], chunk_size)
+    except OSError as e:
+        raise BuildError(e) from e
+
+    return filtertool.apply(final, selected_filters, "output")
+
+
+# The bundles of template tags are built like registered ones.
+AsyncAssetsExtension.BundleClass = Bundle  # ty: ignore[invalid-assignment]
+
+
+class Jinja2Filter(AsyncFilter):
+    """Compiles all source files as Jinja2 templates using Quart contexts.
+
+    Compiled templates are shared by all instances, keyed by the digest of
+    their source, so only new or changed sources are compiled again. Each
+    Jinja environment keeps up to :attr:`template_cache_size` of them.
+    """
 
     name: str = "jinja2"
     max_debug_level = None
 
+    #: How many compiled templates are kept per Jinja environment.
+    template_cache_size = 256
+
+    _templates: WeakKeyDictionary[Environment, dict[str, Template]] = WeakKeyDictionary()
+    _templates_lock = threading.Lock()
+
     def __init__(self, context: dict[str, Any] | None = None) -> None:
         super().__init__()
         self.context = context or {}
 
-    def input(self, _in: Any, out: Any, **kw: Any) -> None:
-        out.write(render_template_string(_in.read(), **self.context))
+    @classmethod
+    def get_template(cls, jinja_env: Environment, source: str) -> Template:
+        """Return ``source`` compiled by ``jinja_env``, from the cache if possible."""
+        digest = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        with cls._templates_lock:
+            templates = cls._templates.setdefault(jinja_env, {})
+            template = templates.pop(digest, None)
+            if template is not None:
+                # Reinsert to mark the template as the most recently used.
+                templates[digest] = template
+                return template
+
+        template = jinja_env.from_string(source)
+        with cls._templates_lock:
+            templates[digest] = template
+            while len(templates) > cls.template_cache_size:
+                del templates[next(iter(templates))]
+        return template
+
+    @classmethod
+    def clear_template_cache(cls) -> None:
+        """Forget all compiled templates."""
+        with cls._templates_lock:
+            cls._templates.clear()
+
+    async def input_async(self, _in: Any, out: Any, **kw: Any) -> None:
+        # Like ``render_template_string``, but with a cached template.
+        app = current_app._get_current_object()  # ty: ignore[unresolved-attribute]
+        context = dict(self.context)
+        await app.update_template_context(context)
+        template = self.get_template(app.jinja_env, _in.read())
+        await before_render_template.send_async(
+            app, _sync_wrapper=app.ensure_async, template=template, context=context
+        )
+        out.write(await template.render_async(context))
+        await template_rendered.send_async(
+            app, _sync_wrapper=app.ensure_async, template=template, context=context
+        )
+
+
+@functools.cache
+def _config_key(key: str) -> str:
+    """Return the Quart config key for the webassets config key ``key``."""
+    if key.lower() in env_options or key.lower() in quart_env_options:
+        return f"ASSETS_{key.upper()}"
+    return key.upper()
+
+
+# Marks keys which a frozen config snapshot does not have.
+_ABSENT = object()
 
 
 class QuartConfigStorage(ConfigStorage):
     """Uses the config object of a Quart app as the backend: either the app
     instance bound to the extension directly, or the current Quart app on
     the stack. Also provides per-application defaults for some values.
+
+    The config of an app can be frozen with :meth:`freeze`, after which
+    reads are served from a snapshot.
     """
 
     def __init__(self, *a: Any, **kw: Any) -> None:
         self._defaults: dict[str, Any] = {}
+        # The base class implementation does nothing, so skip calling it.
+        self._has_deprecated = type(self)._get_deprecated is not ConfigStorage._get_deprecated
+        self._frozen_apps: WeakSet[Quart] = WeakSet()
+        # The snapshot of the bound app, read without resolving the app.
+        self._snapshot: dict[str, Any] | None = None
+        self._snapshot_key = f"quart_assets.config.{id(self):x}"
         ConfigStorage.__init__(self, *a, **kw)
 
     def _transform_key(self, key: str) -> str:
-        if key.lower() in env_options:
-            return f"ASSETS_{key.upper()}"
-
-        return key.upper()
+        return _config_key(key)
 
     def setdefault(self, key: str, value: Any) -> None:
         """We may not always be connected to an app, but we still need
@@ -125,33 +1366,93 @@ class QuartConfigStorage(ConfigStorage):
         except RuntimeError:
             self._defaults[key] = value
 
-    def __contains__(self, key: str) -> bool:
-        return self._transform_key(key) in self.env._app.config
+    def freeze(self, app: Quart | None = None) -> None:
+        """Serve config reads for ``app`` (or the current app) from a snapshot.
 
-    def __getitem__(self, key: str) -> Any:
-        value = self._get_deprecated(key)
-        if value is not None:
+        Reads become a single dictionary lookup. Values set through this
+        storage (or the environment's properties) update the snapshot, but
+        later changes made directly to ``app.config`` are not seen until
+        :meth:`unfreeze` is called.
+        """
+        app = app or self.env._app
+        snapshot: dict[str, Any] = {}
+        # Kept with the app, so that it goes away along with it.
+        app.extensions[self._snapshot_key] = snapshot
+        self._frozen_apps.add(app)
+        if app is self.env.app:
+            self._snapshot = snapshot
+        for key in [*env_options, *quart_env_options, *self._defaults]:
+            try:
+                snapshot[key] = self._lookup(app, key)
+            except KeyError:
+                snapshot[key] = _ABSENT
+
+    def unfreeze(self, app: Quart | None = None) -> None:
+        """Read the config of ``app`` (or of all apps) from ``app.config`` again."""
+        if app is None or app is self.env.app:
+            self._snapshot = None
+        if app is not None:
+            app.extensions.pop(self._snapshot_key, None)
+            return
+        for app in list(self._frozen_apps):
+            app.extensions.pop(self._snapshot_key, None)
+
+    def _lookup(self, app: Quart, key: str) -> Any:
+        # First try the app's config, then a non-app specific default value.
+        value = app.config.get(self._transform_key(key), _ABSENT)
+        if value is not _ABSENT:
             return value
-
-        # First try the current app's config
-        public_key = self._transform_key(key)
-        if self.env._app:
-            if public_key in self.env._app.config:
-                return self.env._app.config[public_key]
-
-        # Try a non-app specific default value
         if key in self._defaults:
-            return self._defaults.__getitem__(key)
+            return self._defaults[key]
+        raise KeyError(key)
+
+    def __contains__(self, key: str) -> bool:
+        return self._transform_key(key) in self.env._app.config
 
-        # We've run out of options
-        raise KeyError()
+    def __getitem__(self, key: str) -> Any:
+        if self._has_deprecated:
+            value = self._get_deprecated(key)
+            if value is not None:
+                return value
+
+        snapshot = self._snapshot
+        if snapshot is not None:
+            value = snapshot.get(key, _ABSENT)
+            if value is not _ABSENT:
+                return value
+            app = self.env._app
+        else:
+            app = self.env._app
+            snapshot = app.extensions.get(self._snapshot_key)
+            if snapshot is None:
+                return self._lookup(app, key)
+            value = snapshot.get(key, _ABSENT)
+            if value is not _ABSENT:
+                return value
+
+        if key in snapshot:
+            raise KeyError(key)
+        try:
+            value = snapshot[key] = self._lookup(app, key)
+        except KeyError:
+            snapshot[key] = _ABSENT
+            raise
+        return value
 
     def __setitem__(self, key: str, value: Any) -> None:
         if not self._set_deprecated(key, value):
-            self.env._app.config[self._transform_key(key)] = value
+            app = self.env._app
+            app.config[self._transform_key(key)] = value
+            snapshot = app.extensions.get(self._snapshot_key)
+            if snapshot is not None:
+                snapshot[key] = value
 
     def __delitem__(self, key: str) -> None:
-        del self.env._app.config[self._transform_key(key)]
+        app = self.env._app
+        del app.config[self._transform_key(key)]
+        snapshot = app.extensions.get(self._snapshot_key)
+        if snapshot is not None:
+            snapshot.pop(key, None)
 
 
 class QuartResolver(Resolver):
@@ -174,6 +1475,148 @@ class QuartResolver(Resolver):
     are no longer resolved.
     """
 
+    #: How many URLs built outside a request context are kept per app.
+    url_cache_size = 1024
+
+    def __init__(self) -> None:
+        self._prefix_tables: WeakKeyDictionary[Quart, tuple[int, dict[str, Any]]] = (
+            WeakKeyDictionary()
+        )
+        self._url_tables: WeakKeyDictionary[Quart, tuple[str, Any, int, dict[Any, str]]] = (
+            WeakKeyDictionary()
+        )
+        self._url_tables_lock = threading.Lock()
+        self._directory_index: dict[str, tuple[int, dict[str, bool]]] = {}
+
+    def _get_prefix_table(self, app: Quart) -> dict[str, Any]:
+        """Return the ``(static folder, endpoint)`` pairs of ``app``.
+
+        Blueprints are keyed by name and the app itself by ``""``, which is
+        not a valid blueprint name; the folder is ``None`` if there is no
+        static folder. The table is rebuilt when blueprints are registered.
+        """
+        cached = self._prefix_tables.get(app)
+        if cached is not None and cached[0] == len(app.blueprints):
+            return cached[1]
+
+        table: dict[str, Any] = {
+            name: (
+                blueprint.static_folder if blueprint.has_static_folder else None,
+                f"{name}.static",
+            )
+            for name, blueprint in app.blueprints.items()
+        }
+        table[""] = (app.static_folder if app.has_static_folder else None, "static")
+        self._prefix_tables[app] = (len(app.blueprints), table)
+        return table
+
+    def clear_prefix_cache(self, app: Quart | None = None) -> None:
+        """Forget the cached static folders of ``app``, or of all apps.
+
+        Registering a blueprint does this automatically; call it after
+        changing the ``static_folder`` of an app or blueprint which has
+        already been used to resolve assets.
+        """
+        if app is None:
+            self._prefix_tables.clear()
+        else:
+            self._prefix_tables.pop(app, None)
+
+    def _get_url_table(self, app: Quart) -> tuple[Any, dict[Any, str]]:
+        """Return a bound URL adapter of ``app`` and its built URLs.
+
+        Used outside a request context, to build URLs and to match the
+        paths of early hints. The adapter is bound once per
+        ``SERVER_NAME``; it reads the live URL map, so only the
+        ``(endpoint, filename)`` to URL table, which keeps up to
+        :attr:`url_cache_size` most recently used URLs, is replaced when
+        view functions are added to the app.
+        """
+        server_name = app.config.get("SERVER_NAME") or ""
+        cached = self._url_tables.get(app)
+        if cached is not None and cached[0] == server_name:
+            url_adapter = cached[1]
+        else:
+            url_adapter = app.url_map.bind(server_name, url_scheme="http")
+            cached = None
+
+        if cached is not None and cached[2] == len(app.view_functions):
+            return url_adapter, cached[3]
+        urls: dict[Any, str] = {}
+        self._url_tables[app] = (server_name, url_adapter, len(app.view_functions), urls)
+        return url_adapter, urls
+
+    def clear_url_cache(self, app: Quart | None = None) -> None:
+        """Forget the URLs built outside a request context for ``app``, or all apps."""
+        if app is None:
+            self._url_tables.clear()
+        else:
+            self._url_tables.pop(app, None)
+
+    def _list_directory(self, directory: str) -> dict[str, bool] | None:
+        """Return whether each entry of ``directory`` is a directory, by name.
+
+        Listings are kept until the modification time of the directory
+        changes; ``None`` is returned if it cannot be listed.
+        """
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+        cached = self._directory_index.get(directory)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        try:
+            with os.scandir(directory) as it:
+                entries = {entry.name: entry.is_dir() for entry in it}
+        except OSError:
+            return None
+        self._directory_index[directory] = (mtime, entries)
+        return entries
+
+    def clear_directory_index(self, directory: str | None = None) -> None:
+        """Forget the listing of ``directory`` used to expand globs, or all of them."""
+        if directory is None:
+            self._directory_index.clear()
+        else:
+            self._directory_index.pop(path.normpath(directory), None)
+
+    def glob(self, basedir: str, expr: str) -> list[str]:
+        """Evaluate a glob expression, as :meth:`Resolver.glob` does.
+
+        The directories are read from an index rather than scanned, so
+        expanding a glob again costs a ``stat`` of each directory visited.
+        """
+        parts = expr.replace(os.sep, "/").split("/")
+        if (
+            # With glob2 installed, webassets expands ``**`` recursively.
+            webassets.env.glob is not glob
+            or glob.has_magic(basedir)
+            or path.isabs(expr)
+            or any(part in ("", ".", "..") for part in parts)
+        ):
+            return Resolver.glob(self, basedir, expr)
+
+        matches = [path.normpath(basedir)]
+        for i, part in enumerate(parts):
+            # Directories are only kept to descend into; files only at the end.
+            want_dirs = i < len(parts) - 1
+            found = []
+            for directory in matches:
+                entries = self._list_directory(directory)
+                if entries is None:
+                    continue
+                if not glob.has_magic(part):
+                    names = [part] if part in entries else []
+                elif part.startswith("."):
+                    names = fnmatch.filter(entries, part)
+                else:
+                    names = [n for n in fnmatch.filter(entries, part) if not n.startswith(".")]
+                found.extend(path.join(directory, n) for n in names if entries[n] == want_dirs)
+            matches = found
+        return sorted(matches)
+
     def split_prefix(self, ctx: Any, item: str) -> tuple[str, str, str]:
         """Split a blueprint-prefixed asset path.
 
@@ -194,20 +1637,19 @@ class QuartResolver(Resolver):
         if app is None:
             raise ValueError("No app context available")
 
+        table = self._get_prefix_table(app)
         if "/" in item:
             blueprint_name, name = item.split("/", 1)
-            if blueprint_name and name and blueprint_name in app.blueprints:
-                try:
-                    directory = get_static_folder(app.blueprints[blueprint_name])
-                except TypeError as e:
-                    raise TypeError(f"Blueprint '{blueprint_name}' has no static folder") from e
-                return directory, name, f"{blueprint_name}.static"
+            if blueprint_name and name and blueprint_name in table:
+                directory, endpoint = table[blueprint_name]
+                if directory is None:
+                    raise TypeError(f"Blueprint '{blueprint_name}' has no static folder")
+                return directory, name, endpoint
 
-        try:
-            directory = get_static_folder(app)
-        except TypeError as e:
-            raise TypeError("App has no static folder configured") from e
-        return directory, item, "static"
+        directory, endpoint = table[""]
+        if directory is None:
+            raise TypeError("App has no static folder configured")
+        return directory, item, endpoint
 
     def use_webassets_system_for_output(self, ctx: Any) -> bool:
         return ctx.config.get("directory") is not None or ctx.config.get("url") is not None
@@ -216,16 +1658,26 @@ class QuartResolver(Resolver):
         return bool(ctx.load_path)
 
     def search_for_source(self, ctx: Any, item: str) -> Any:
-        if self.use_webassets_system_for_sources(ctx):
-            return Resolver.search_for_source(self, ctx, item)
-
-        directory, item, _ = self.split_prefix(ctx, item)
-        try:
-            return self.consider_single_directory(directory, item)
-        except IOError:
-            # Return the would-be path so webassets can report a useful
-            # "missing source" error later instead of an opaque IOError here.
-            return path.normpath(path.join(directory, item))
+        shared = _shared_sources.get()
+        if shared is None:
+            return self._search_for_source(ctx, item)
+        if item not in shared:
+            shared[item] = self._search_for_source(ctx, item)
+        result = shared[item]
+        return list(result) if isinstance(result, list) else result
+
+    def _search_for_source(self, ctx: Any, item: str) -> Any:
+        with _timer(getattr(ctx, "environment", ctx), "resolve", item):
+            if self.use_webassets_system_for_sources(ctx):
+                return Resolver.search_for_source(self, ctx, item)
+
+            directory, item, _ = self.split_prefix(ctx, item)
+            try:
+                return self.consider_single_directory(directory, item)
+            except IOError:
+                # Return the would-be path so webassets can report a useful
+                # "missing source" error later instead of an opaque IOError here.
+                return path.normpath(path.join(directory, item))
 
     def resolve_output_to_path(self, ctx: Any, target: str, bundle: Any) -> Any:
         if self.use_webassets_system_for_output(ctx):
@@ -257,6 +1709,10 @@ class QuartResolver(Resolver):
         :meth:`split_prefix`; this is needed when ``item`` is a glob that was
         resolved to multiple files.
         """
+        with _timer(getattr(ctx, "environment", ctx), "url", item):
+            return self._convert_item_to_quart_url(ctx, item, filepath)
+
+    def _convert_item_to_quart_url(self, ctx: Any, item: str, filepath: str | None) -> str:
         directory, rel_path, endpoint = self.split_prefix(ctx, item)
 
         if filepath is not None:
@@ -270,10 +1726,19 @@ class QuartResolver(Resolver):
         else:
             # `url_for` outside a request context needs SERVER_NAME; bind the
             # adapter directly so the URL map still resolves the static rules.
-            app = ctx.environment._app
-            server_name = app.config.get("SERVER_NAME") or ""
-            url_adapter = app.url_map.bind(server_name, url_scheme="http")
-            url = url_adapter.build(endpoint, {"filename": filename}, force_external=False)
+            url_adapter, urls = self._get_url_table(ctx.environment._app)
+            key = (endpoint, filename)
+            with self._url_tables_lock:
+                url = urls.pop(key, None)
+                if url is not None:
+                    # Reinsert to mark the URL as the most recently used.
+                    urls[key] = url
+            if url is None:
+                url = url_adapter.build(endpoint, {"filename": filename}, force_external=False)
+                with self._url_tables_lock:
+                    urls[key] = url
+                    while len(urls) > self.url_cache_size:
+                        del urls[next(iter(urls))]
 
         # Scheme is unknown during build; emit scheme-relative URLs.
         if url:
@@ -281,6 +1746,138 @@ class QuartResolver(Resolver):
         return url
 
 
+# File name suffixes of the encodings bundle outputs can be compressed with.
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+
+def _compress(encoding: str, data: bytes) -> bytes:
+    """Compress ``data`` with ``encoding``, a key of :data:`COMPRESSION_SUFFIXES`.
+
+    Raises :class:`ImportError` for ``"br"`` if ``brotli`` is not installed.
+    """
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    import brotli
+
+    return brotli.compress(data)
+
+
+def _available_encodings() -> tuple[str, ...]:
+    """Return the keys of :data:`COMPRESSION_SUFFIXES` which can be used here."""
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        return ("gzip",)
+    return tuple(COMPRESSION_SUFFIXES)
+
+
+@contextmanager
+def _atomic_open(filename: str, mode: str = "wb", **kwargs: Any) -> Generator[IO[Any]]:
+    """Open a temporary file which replaces ``filename`` once it is written.
+
+    The file gets the usual permissions for new files, as the process umask
+    is applied when it is created.
+    """
+    directory, name = path.split(path.abspath(filename))
+    temp_filename = path.join(directory, f".{name}.{os.urandom(8).hex()}.tmp")
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    fd = os.open(temp_filename, flags, 0o666)
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+        os.replace(temp_filename, filename)
+    except BaseException:
+        os.unlink(temp_filename)
+        raise
+
+
+def _write_atomic(filename: str, data: bytes) -> None:
+    """Write ``data`` to ``filename`` so that readers never see a partial file."""
+    with _atomic_open(filename) as f:
+        f.write(data)
+
+
+class _ServedOutput:
+    """The contents of a built bundle, kept in memory to be served."""
+
+    # Preferred encodings first, for clients accepting several equally.
+    encodings = ("br", "gzip", "identity")
+
+    def __init__(self, filename: str, version_in_name: bool, version_in_query: bool) -> None:
+        self.filename = filename
+        self.version_in_name = version_in_name
+        self.version_in_query = version_in_query
+        self.mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        self.stat_key: tuple[int, int] | None = None
+        self.variants: dict[str, tuple[bytes, str]] = {}
+
+    def changed(self) -> bool:
+        """Whether the file differs from the copy in memory, by size and mtime."""
+        st = os.stat(self.filename)
+        return (st.st_size, st.st_mtime_ns) != self.stat_key
+
+    def load(self) -> None:
+        """Read the file, and the compressed copies written along with it."""
+        st = os.stat(self.filename)
+        with open(self.filename, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        variants = {"identity": (data, digest)}
+        for encoding, suffix in COMPRESSION_SUFFIXES.items():
+            sidecar = self.filename + suffix
+            try:
+                # A copy older than the file is left over from a previous build.
+                if os.stat(sidecar).st_mtime_ns < st.st_mtime_ns:
+                    continue
+                with open(sidecar, "rb") as f:
+                    body = f.read()
+            except OSError:
+                continue
+            if len(body) < len(data):
+                variants[encoding] = (body, f"{digest}-{encoding}")
+        self.variants, self.stat_key = variants, (st.st_size, st.st_mtime_ns)
+
+    def negotiate(self, accept_encodings: Any) -> str | None:
+        """Return the best encoding of this output for ``accept_encodings``,
+        or ``None`` if none is acceptable."""
+        qualities = {value.lower(): quality for value, quality in accept_encodings}
+        default = qualities.get("*")
+        best, best_quality = None, 0.0
+        for encoding in self.encodings:
+            if encoding not in self.variants:
+                continue
+            quality = qualities.get(encoding, default)
+            if quality is None:
+                # Unless ruled out, identity is acceptable, if least preferred.
+                quality = 0.001 if encoding == "identity" else 0.0
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+
+class _EarlyHints:
+    """ASGI middleware sending an endpoint's last preload links as early hints."""
+
+    def __init__(self, asgi_app: Any, env: Any, app: Quart) -> None:
+        self.asgi_app = asgi_app
+        self.env = env
+        self.app = app
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        if scope["type"] == "http" and "http.response.early_hint" in (
+            scope.get("extensions") or {}
+        ):
+            links = self.env._get_early_hints(self.app, scope)
+            if links:
+                await send(
+                    {
+                        "type": "http.response.early_hint",
+                        "links": [link.encode() for link in links],
+                    }
+                )
+        await self.asgi_app(scope, receive, send)
+
+
 class QuartAssets(BaseEnvironment):
     """This object is used to hold a collection of bundles and configuration.
 
@@ -291,9 +1888,36 @@ class QuartAssets(BaseEnvironment):
     config_storage_class: Any = QuartConfigStorage
     resolver_class = QuartResolver
 
+    #: How many SRI hashes :meth:`calculate_sri` keeps. The cache is sized
+    #: when the environment is created, so set this on the class beforehand.
+    sri_cache_size = 1024
+
+    #: How many characters a streaming build reads and writes at a time.
+    stream_chunk_size = 64 * 1024
+
     def __init__(self, app: Quart | None = None) -> None:
         self.app = app
+        self._render_caches: WeakKeyDictionary[Quart, dict[Any, Any]] = WeakKeyDictionary()
+        self._pending_builds: dict[Any, tuple[Any, asyncio.Future[Any]]] = {}
+        self._default_build_executor: Executor | None = None
+        self._url_manifests: WeakKeyDictionary[Quart, dict[str, Any]] = WeakKeyDictionary()
+        self._served_outputs: WeakKeyDictionary[Quart, tuple[int, dict[str, _ServedOutput]]] = (
+            WeakKeyDictionary()
+        )
+        self._preload_links: WeakKeyDictionary[Quart, dict[str, tuple[str, ...]]] = (
+            WeakKeyDictionary()
+        )
+        self._preloading_apps: WeakSet[Quart] = WeakSet()
+        self._metrics_hooks: tuple[Callable[[str, str, float], Any], ...] = ()
+        self._precompress_encodings: tuple[str, ...] = ()
+        self._sri_for_stat = functools.lru_cache(maxsize=self.sri_cache_size)(self._timed_sri)
         super().__init__()
+        self.config.setdefault("render_cache", True)
+        self.config.setdefault("build_executor", "thread")
+        self.config.setdefault("build_lock", "wait")
+        self.config.setdefault("sri", True)
+        self.config.setdefault("streaming", False)
+        self.config.setdefault("precompile_tags", False)
         if app:
             self.init_app(app)
 
@@ -305,6 +1929,11 @@ class QuartAssets(BaseEnvironment):
         if self.app is not None:
             return self.app
 
+        # Set while rendering, to spare the context lookups below.
+        app = _context_app.get()
+        if app is not None:
+            return app
+
         if has_request_context():
             return request_ctx.app
 
@@ -338,27 +1967,1198 @@ class QuartAssets(BaseEnvironment):
     def url(self, value: str) -> None:
         self.config["url"] = value
 
+    @property
+    def render_cache(self) -> bool:
+        """Whether the results of ``{% assets %}`` tags are memoized.
+
+        Even when enabled the cache is only used while both ``debug`` and
+        ``auto_build`` are off, as otherwise the files behind the URLs may
+        change between renders. See :meth:`use_render_cache`.
+        """
+        return self.config["render_cache"]
+
+    @render_cache.setter
+    def render_cache(self, value: bool) -> None:
+        self.config["render_cache"] = value
+
+    def use_render_cache(self) -> bool:
+        """Return whether ``{% assets %}`` tags may be served from the cache."""
+        return bool(self.render_cache) and not self.debug and not self.auto_build
+
+    def _get_render_cache(self) -> dict[Any, Any]:
+        """Return the render cache of the current application."""
+        app = self._app
+        try:
+            return self._render_caches[app]
+        except KeyError:
+            return self._render_caches.setdefault(app, {})
+
+    def clear_render_cache(self, app: Quart | None = None) -> None:
+        """Forget memoized ``{% assets %}`` results.
+
+        Call this after rebuilding bundles while the application is running
+        so that templates pick up the new URLs and SRI hashes. If ``app`` is
+        given only that application's entries are removed.
+        """
+        if app is None:
+            self._render_caches.clear()
+        else:
+            self._render_caches.pop(app, None)
+
+    @property
+    def build_executor(self) -> Any:
+        """Where bundles are built when an async template auto-builds them.
+
+        ``"thread"`` (the default) uses a thread pool shared by this
+        environment, ``None`` builds on the event loop itself, and any
+        :class:`concurrent.futures.Executor` instance is used as is. Process
+        pools are not supported, as builds need the live application.
+        """
+        return self.config["build_executor"]
+
+    @build_executor.setter
+    def build_executor(self, value: Any) -> None:
+        self.config["build_executor"] = value
+
+    @property
+    def build_lock(self) -> Any:
+        """How processes building the same bundle at once are coordinated.
+
+        Builds hold a lock on a hidden file next to their output, which
+        they write to a temporary file before renaming it into place. With ``"wait"`` (the
+        default) a process finding the lock taken waits for it, then only
+        builds if the bundle is still out of date. With ``"stale"``, builds
+        which are not forced (such as auto-builds) use the existing output
+        instead, if there is one.
+        ``None`` disables the lock.
+        """
+        return self.config["build_lock"]
+
+    @build_lock.setter
+    def build_lock(self, value: Any) -> None:
+        self.config["build_lock"] = value
+
+    def _get_build_executor(self) -> Executor | None:
+        executor = self.build_executor
+        if not executor:
+            return None
+        if executor == "thread":
+            if self._default_build_executor is None:
+                self._default_build_executor = ThreadPoolExecutor(thread_name_prefix="quart-assets")
+            return self._default_build_executor
+        if isinstance(executor, ProcessPoolExecutor):
+            raise ValueError("Bundles cannot be built in a process pool executor")
+        if not isinstance(executor, Executor):
+            raise ValueError(f"Invalid build executor: {executor!r}")
+        return executor
+
+    @property
+    def sri(self) -> bool:
+        """Whether ``{% assets %}`` tags provide SRI hashes as ``ASSET_SRI``.
+
+        Even when enabled, hashes are only calculated for tags which
+        reference ``ASSET_SRI`` (or include other templates).
+        """
+        return self.config["sri"]
+
+    @sri.setter
+    def sri(self, value: bool) -> None:
+        self.config["sri"] = value
+
+    @property
+    def streaming(self) -> bool:
+        """Whether bundles are built without holding their content in memory.
+
+        Sources are read, and outputs written, in chunks of
+        :attr:`stream_chunk_size` characters. Filters only take part if they
+        are :class:`ChunkedFilter` instances; any other filter is handed its
+        content as a whole, as usual. Outputs are written to a temporary file
+        which then replaces the previous output.
+
+        With ``hash`` versions (the default), the output is generated twice:
+        once to hash it, and once to write it.
+        """
+        return self.config["streaming"]
+
+    @streaming.setter
+    def streaming(self, value: bool) -> None:
+        self.config["streaming"] = value
+
+    @property
+    def precompile_tags(self) -> bool:
+        """Whether ``{% assets %}`` tags are resolved when templates are compiled.
+
+        While both ``debug`` and ``auto_build`` are off, tags whose arguments
+        are all literals are replaced by their output when the template is
+        loaded, so rendering them costs no more than rendering plain text.
+        As with the render cache, templates have to be loaded again to pick
+        up rebuilt bundles, e.g. with ``app.jinja_env.cache.clear()``.
+        """
+        return self.config["precompile_tags"]
+
+    @precompile_tags.setter
+    def precompile_tags(self, value: bool) -> None:
+        self.config["precompile_tags"] = value
+
+    def calculate_sri(self, filename: str) -> str | None:
+        """Return the SRI hash of ``filename``, or ``None`` if it is missing.
+
+        Hashes are cached by path, size, modification time and inode, so a
+        file is only read again once it changes. The least recently used
+        entries are evicted beyond :attr:`sri_cache_size`.
+        """
+        try:
+            st = os.stat(filename)
+        except FileNotFoundError:
+            return None
+        return self._sri_for_stat(filename, st.st_size, st.st_mtime_ns, st.st_ino)
+
+    def clear_sri_cache(self) -> None:
+        """Forget all cached SRI hashes."""
+        self._sri_for_stat.cache_clear()
+
+    def _timed_sri(self, filename: str, size: int, mtime_ns: int, inode: int) -> str | None:
+        # The ``os.stat`` fields are only part of the cache key.
+        with _timer(self, "sri", filename):
+            return calculate_sri_on_file(filename)
+
+    def add_metrics_hook(self, hook: Callable[[str, str, float], Any]) -> None:
+        """Report the timings of asset operations to ``hook``.
+
+        ``hook`` is called with the operation, a label and the time taken in
+        seconds; see :class:`AssetMetrics` for the operations. It may be
+        called from any thread. Without hooks, nothing is timed.
+        """
+        self._metrics_hooks = (*self._metrics_hooks, hook)
+
+    def remove_metrics_hook(self, hook: Callable[[str, str, float], Any]) -> None:
+        """Stop reporting timings to ``hook``."""
+        self._metrics_hooks = tuple(h for h in self._metrics_hooks if h is not hook)
+
+    def register(self, name: Any, *args: Any, **kwargs: Any) -> Any:
+        # A template tag may refer to a name which only now becomes a bundle.
+        self.clear_render_cache()
+        if args and not (
+            len(args) == 1 and not kwargs and isinstance(args[0], webassets.bundle.Bundle)
+        ):
+            args, kwargs = (Bundle(*args, **kwargs),), {}
+        return super().register(name, *args, **kwargs)
+
     def init_app(self, app: Quart) -> None:
         # Use our custom async-aware extension instead of the default webassets
         # extension
         app.jinja_env.add_extension(AsyncAssetsExtension)
         app.jinja_env.assets_environment = self  # ty: ignore[unresolved-attribute]
 
+        url_manifest = app.config.get("ASSETS_URL_MANIFEST")
+        if url_manifest:
+            self.load_url_manifest(url_manifest, app)
+        if app.config.get("ASSETS_SERVE_FROM_MEMORY"):
+            self.serve_from_memory(app)
+        if app.config.get("ASSETS_PRELOAD"):
+            self.preload(app)
+        if app.config.get("ASSETS_FREEZE_CONFIG"):
+
+            @app.before_serving
+            async def _freeze_config() -> None:
+                self.config.freeze(app)
+
+        if app.config.get("ASSETS_WARMUP"):
+
+            @app.before_serving
+            async def _warmup() -> None:
+                await self.warmup(app)
+
+    def urls_for(self, bundles: Iterable[Any]) -> list[str]:
+        """Return the URLs of several bundles, as ``{% assets_many %}`` does.
+
+        Each item is the name of a registered bundle, a :class:`Bundle` or a
+        list of source files. The bundles are resolved in a single pass, and
+        a URL which several of them share is returned once.
+        """
+        extension: Any = self._app.jinja_env.extensions[AsyncAssetsExtension.identifier]
+        results = extension._build_bundles(list(bundles), sri=False)
+        return [url for url, _, _ in _unique_entries(results)]
+
+    async def warmup(self, app: Quart | None = None) -> dict[str, float]:
+        """Prepare every registered bundle for its first request.
+
+        Each bundle is built if out of date, its URLs resolved and its SRI
+        hashes calculated, and the results memoized in the render cache (see
+        :meth:`use_render_cache`). Bundles are handled concurrently by the
+        :attr:`build_executor`. The time spent on each one is logged, and
+        returned by bundle name; bundles which fail are logged and left out.
+
+        Setting ``ASSETS_WARMUP`` runs this before the application serves.
+        """
+        app = app or self._app
+        extension: Any = app.jinja_env.extensions[AsyncAssetsExtension.identifier]
+
+        def warm(name: str) -> float:
+            start = time.perf_counter()
+            bundle = self[name]
+            if bundle.output and not self.auto_build and not self.debug:
+                # Otherwise resolving the URLs builds the bundle if needed.
+                bundle.build()
+            # Tags which use ASSET_SRI and tags which do not are cached apart.
+            for sri in (True, False):
+                extension._build_bundle(None, None, None, None, (name,), sri)
+            return time.perf_counter() - start
+
+        names = list(self._named_bundles)
+        executor = self._get_build_executor()
+        if executor is None:
+            results: list[Any] = []
+            for name in names:
+                try:
+                    results.append(warm(name))
+                except Exception as e:
+                    results.append(e)
+        else:
+            loop = asyncio.get_running_loop()
+            results = await asyncio.gather(
+                *(
+                    loop.run_in_executor(executor, contextvars.copy_context().run, warm, name)
+                    for name in names
+                ),
+                return_exceptions=True,
+            )
+
+        report = {}
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException):
+                app.logger.error(f"Failed to warm up bundle {name}: {result}")
+            else:
+                app.logger.info(f"Warmed up bundle {name} ({result:.2f}s)")
+                report[name] = result
+        app.logger.info(f"Warmed up {len(report)} of {len(names)} bundles")
+        return report
+
+    def serve_from_memory(self, app: Quart | None = None) -> None:
+        """Serve the outputs of bundles from memory rather than from disk.
+
+        Requests to the static endpoints of ``app`` (or the current
+        application) for a bundle output are answered from a copy kept in
+        memory, along with gzip and, if the ``brotli`` package is installed,
+        brotli encodings chosen by ``Accept-Encoding``. Responses carry a
+        strong ETag, and are cacheable forever when the URL is versioned.
+
+        The compressed encodings are written next to each output whenever
+        this environment builds a bundle; ``quart assets build --precompress``
+        writes them for builds run elsewhere. Outputs are read on first
+        request, and again whenever their modification time changes.
+        """
+        app = app or self._app
+        self._precompress_encodings = _available_encodings()
+        self._served_outputs.pop(app, None)
+        app.before_request(self._send_served_output)
+
+    def _get_served_outputs(self, app: Quart) -> dict[str, _ServedOutput]:
+        """Return the bundle outputs of ``app`` by absolute path.
+
+        Rebuilt when bundles are added to the environment.
+        """
+        cached = self._served_outputs.get(app)
+        if cached is not None and cached[0] == len(self):
+            return cached[1]
+
+        outputs = {}
+        for bundle in self:
+            with bundle.bind(self):
+                for child, _, child_ctx in bundle.iterbuild(wrap(self, bundle)):
+                    if not child.output:
+                        continue
+                    try:
+                        filename = path.normpath(child.resolve_output(child_ctx))
+                    except BundleError:
+                        continue
+                    # Mirrors how webassets decides whether to add a version query.
+                    version_in_name = has_placeholder(child.output)
+                    version_in_query = bool(self.url_expire) or (
+                        self.url_expire is None and not version_in_name
+                    )
+                    outputs[filename] = _ServedOutput(filename, version_in_name, version_in_query)
+        self._served_outputs[app] = (len(self), outputs)
+        return outputs
+
+    async def _send_served_output(self) -> Response | None:
+        """Answer a static file request for a bundle output from memory."""
+        rule = request.url_rule
+        filename = (request.view_args or {}).get("filename")
+        if rule is None or filename is None:
+            return None
+        if rule.endpoint == "static":
+            blueprint_name = ""
+        elif rule.endpoint.endswith(".static"):
+            blueprint_name = rule.endpoint[: -len(".static")]
+        else:
+            return None
+
+        app = self._app
+        folder = self.resolver._get_prefix_table(app).get(blueprint_name, (None,))[0]
+        if folder is None:
+            return None
+        served = self._get_served_outputs(app).get(path.normpath(path.join(folder, filename)))
+        if served is None:
+            return None
+        try:
+            if served.changed():
+                await asyncio.to_thread(served.load)
+        except OSError:
+            # Keep serving the last copy while the file is being replaced.
+            if not served.variants:
+                return None
+
+        encoding = served.negotiate(request.accept_encodings)
+        if encoding is None:
+            response = Response(b"", status=406)
+            response.vary.add("Accept-Encoding")
+            return response
+        body, etag = served.variants[encoding]
+        if request.if_none_match.contains(etag):
+            response = Response(b"", status=304)
+        else:
+            response = Response(body, mimetype=served.mimetype)
+            if encoding != "identity":
+                response.headers["Content-Encoding"] = encoding
+        response.set_etag(etag)
+        response.vary.add("Accept-Encoding")
+        # A versioned URL changes whenever the output does.
+        if served.version_in_name or (served.version_in_query and request.query_string):
+            response.cache_control.public = True
+            response.cache_control.max_age = 31536000
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
+
+    def preload(self, app: Quart | None = None) -> None:
+        """Have browsers fetch the stylesheets and scripts of pages early.
+
+        The URLs rendered by ``{% assets %}`` tags during a request to
+        ``app`` (or the current application) are collected, and those of
+        stylesheets and scripts sent back as ``Link: rel=preload`` headers.
+        The links are also kept by endpoint, so that later requests to the
+        same endpoint are sent them as ``103 Early Hints`` before the view
+        runs, if the server supports it. Enabling it again for the same app
+        does nothing.
+        """
+        app = app or self._app
+        if app in self._preloading_apps:
+            return
+        self._preloading_apps.add(app)
+        app.before_request(self._collect_preload)
+        app.after_request(self._add_preload_links)
+        app.asgi_app = _EarlyHints(app.asgi_app, self, app)  # ty: ignore[invalid-assignment]
+
+    async def _collect_preload(self) -> None:
+        _preload_urls.set([])
+
+    async def _add_preload_links(self, response: Response) -> Response:
+        """Add the collected URLs to ``response`` as preload links."""
+        links = _preload_links(_preload_urls.get() or ())
+        if not links:
+            return response
+        response.headers.add("Link", ", ".join(links))
+        if request.endpoint is not None and response.status_code == 200:
+            self._preload_links.setdefault(self._app, {})[request.endpoint] = links
+        return response
+
+    def _get_early_hints(self, app: Quart, scope: dict[str, Any]) -> tuple[str, ...]:
+        """Return the preload links last sent for the endpoint of ``scope``."""
+        links = self._preload_links.get(app)
+        if not links:
+            return ()
+        path_info = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path_info.startswith(root_path):
+            path_info = path_info[len(root_path) :]
+        url_adapter, _ = self.resolver._get_url_table(app)
+        try:
+            endpoint, _ = url_adapter.match(path_info, method=scope["method"])
+        except HTTPException:
+            return ()
+        return links.get(endpoint, ())
+
+    def load_url_manifest(self, filename: str, app: Quart | None = None) -> None:
+        """Serve ``{% assets %}`` tags from a manifest written by
+        ``quart assets build --manifest``.
+
+        Once loaded, URLs and SRI hashes for ``app`` (or the current
+        application) come from the manifest alone; bundles are neither
+        resolved nor built, and rendering a bundle that is missing from the
+        manifest raises :class:`~webassets.exceptions.BundleError`.
+        """
+        with open(filename, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != URL_MANIFEST_VERSION:
+            raise ValueError(f"Unsupported URL manifest version in {filename}")
+        self._url_manifests[app or self._app] = data["bundles"]
+
+    def _get_url_manifest(self) -> dict[str, Any] | None:
+        if not self._url_manifests:
+            return None
+        return self._url_manifests.get(self._app)
+
+    def write_url_manifest(self, filename: str, names: list[str] | None = None) -> None:
+        """Write the URLs, SRI hashes and sizes of the named bundles to
+        ``filename``, for use with :meth:`load_url_manifest`.
+
+        The bundles should already be built. URLs are generated outside of a
+        request context, so they do not include any ``SCRIPT_NAME`` prefix.
+        """
+        bundles: dict[str, Any] = {}
+        for name, bundle in self._named_bundles.items():
+            if names and name not in names:
+                continue
+            with bundle.bind(self):
+                urls = _urls_with_sri(self, bundle, bundle.urls(calculate_sri=False))
+                ctx = wrap(self, bundle)
+                outputs = [
+                    child.resolve_output(child_ctx)
+                    for child, _, child_ctx in bundle.iterbuild(ctx)
+                    if child.output
+                ]
+            # Sizes are only known when every URL points at a built output.
+            sizes: list[int | None] = [None] * len(urls)
+            if len(outputs) == len(urls):
+                sizes = [path.getsize(output) for output in outputs]
+            bundles[name] = {
+                "extra": bundle.extra,
+                "urls": [
+                    {"url": entry["uri"], "sri": entry["sri"], "size": size}
+                    for entry, size in zip(urls, sizes)
+                ],
+            }
+
+        data = {"version": URL_MANIFEST_VERSION, "bundles": bundles}
+        _write_atomic(filename, json.dumps(data, separators=(",", ":"), sort_keys=True).encode())
+
     def from_yaml(self, path: str) -> None:
         """Register bundles from a YAML configuration file."""
-        self.register(YAMLLoader(path).load_bundles())
+        self.register(_YAMLLoader(path).load_bundles())
 
     def from_module(self, path: str | ModuleType) -> None:
         """Register bundles from a Python module."""
         self.register(PythonLoader(path).load_bundles())
 
 
+class _YAMLLoader(YAMLLoader):
+    """Loads the bundles of a YAML file as :class:`Bundle` instances."""
+
+    def _get_bundle(self, data: dict[str, Any]) -> Bundle:
+        return Bundle(
+            *self._yield_bundle_contents(data),
+            filters=data.get("filters", None),
+            output=data.get("output", None),
+            debug=data.get("debug", None),
+            extra=data.get("extra", {}),
+            config=data.get("config", {}),
+            depends=data.get("depends", None),
+        )
+
+
 # Override webassets' default jinja2 filter so it renders with Quart's
 # template context.
 register_filter(Jinja2Filter)
 
 
-def _webassets_cmd(cmd: str, info: ScriptInfo) -> None:
+class _ReplacingFilesystemCache(FilesystemCache):
+    """A filesystem cache which several processes can write to at once.
+
+    webassets removes an existing cache file before renaming the new one
+    into place, which fails if another builder removed it first.
+    """
+
+    def set(self, key: Any, data: Any) -> None:
+        fd, temp_filename = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(data, f)
+            if self.new_file_mode is not None:
+                os.chmod(temp_filename, self.new_file_mode)
+            os.replace(temp_filename, path.join(self.directory, make_md5(self.V, key)))
+        except BaseException:
+            os.unlink(temp_filename)
+            raise
+
+
+@functools.lru_cache(maxsize=1024)
+def _stat_file_digest(filename: str, size: int, mtime_ns: int, inode: int) -> str:
+    """Return the SHA-256 digest of a file with the given ``os.stat`` fields."""
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_digest(filename: str) -> str:
+    """Return the SHA-256 digest of a file, reusing it while the file is unchanged."""
+    st = os.stat(filename)
+    return _stat_file_digest(filename, st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+def _bundle_source_files(bundle: Any, ctx: Any) -> tuple[list[str], list[str]]:
+    """Return the source files and the ``depends`` files of a bundle tree."""
+    sources: list[str] = []
+    depends = list(bundle.resolve_depends(ctx))
+    for _, item in bundle.resolve_contents(ctx):
+        if isinstance(item, webassets.bundle.Bundle):
+            nested_sources, nested_depends = _bundle_source_files(item, wrap(ctx, item))
+            sources.extend(nested_sources)
+            depends.extend(nested_depends)
+        elif not is_url(item):
+            sources.append(item)
+    return sources, depends
+
+
+class ContentHashUpdater(TimestampUpdater):
+    """Rebuild bundles when the contents of their source files change.
+
+    Modification times are useless on fresh checkouts, where every file
+    looks new. This updater keeps digests of the sources and the output of
+    each bundle in the environment's cache instead, which is on disk by
+    default, so bundles whose sources are byte-identical to the last build
+    are skipped. Without a cache it compares timestamps.
+
+    Select it with ``ASSETS_UPDATER = "content_hash"``.
+    """
+
+    id = "content_hash"
+
+    def input_digests(self, bundle: Any, ctx: Any) -> tuple[str, str]:
+        """Return digests of the definition and sources, and of the ``depends`` files."""
+        digests = []
+        for filenames in _bundle_source_files(bundle, ctx):
+            digest = hashlib.sha256(str(hash_func(bundle)).encode())
+            for filename in filenames:
+                try:
+                    name = path.relpath(filename, ctx.directory)
+                except ValueError:
+                    name = filename
+                digest.update(name.replace("\\", "/").encode() + b"\0")
+                try:
+                    digest.update(_file_digest(filename).encode())
+                except OSError:
+                    digest.update(b"missing")
+            digests.append(digest.hexdigest())
+        return digests[0], digests[1]
+
+    def needs_rebuild(self, bundle: Any, ctx: Any) -> Any:
+        if not ctx.cache:
+            return super().needs_rebuild(bundle, ctx)
+
+        stored = ctx.cache.get(("content_hash", bundle.output))
+        if stored is None:
+            return True
+        try:
+            output_digest = _file_digest(bundle.resolve_output(ctx))
+        except (BundleError, OSError):
+            return True
+        sources_digest, depends_digest = self.input_digests(bundle, ctx)
+        if depends_digest != stored[1]:
+            # Filters may have cached results which ignore the dependencies.
+            return SKIP_CACHE
+        return (sources_digest, output_digest) != (stored[0], stored[2])
+
+    def build_done(self, bundle: Any, ctx: Any) -> None:
+        super().build_done(bundle, ctx)
+        if not ctx.cache:
+            return
+        try:
+            output_digest = _file_digest(bundle.resolve_output(ctx))
+        except (BundleError, OSError):
+            return
+        ctx.cache.set(
+            ("content_hash", bundle.output), (*self.input_digests(bundle, ctx), output_digest)
+        )
+
+    def is_up_to_date(self, bundle: Any, env: Any) -> bool:
+        """Whether none of the outputs of ``bundle`` needs to be rebuilt."""
+        ctx = wrap(env, bundle)
+        with bundle.bind(env):
+            try:
+                return all(
+                    child.output and not self.needs_rebuild(child, child_ctx)
+                    for child, _, child_ctx in bundle.iterbuild(ctx)
+                )
+            except (BuildError, BundleError):
+                return False
+
+
+def _forget_resolved(bundle: Any) -> None:
+    """Make ``bundle`` and its nested bundles resolve their globs again."""
+    bundle._resolved_contents = None
+    bundle._resolved_depends = None
+    for item in bundle.contents:
+        if isinstance(item, webassets.bundle.Bundle):
+            _forget_resolved(item)
+
+
+def _bundle_paths(env: Any, bundle: Any, refresh: bool = False) -> tuple[set[str], set[str]]:
+    """Return the source files and the output files of ``bundle``.
+
+    webassets caches the files matched by globs; with ``refresh`` they
+    are matched again.
+    """
+    if refresh:
+        _forget_resolved(bundle)
+    ctx = wrap(env, bundle)
+    with bundle.bind(env):
+        try:
+            sources = {path.normpath(p) for p in get_all_bundle_files(bundle, ctx)}
+        except BundleError:
+            sources = set()
+        outputs = {
+            path.normpath(child_ctx.resolver.resolve_output_to_path(child_ctx, child.output, child))
+            for child, _, child_ctx in bundle.iterbuild(ctx)
+            if child.output
+        }
+    return sources, outputs
+
+
+def _plan_build_groups(env: Any, bundles: list[Any]) -> list[list[int]]:
+    """Split ``bundles`` into groups which can be built independently.
+
+    Bundles writing the same output file, or reading the output of another
+    bundle, are put into the same group. Within a group the indexes are
+    ordered so that a bundle is built after the bundles it reads from.
+    """
+    paths = [_bundle_paths(env, bundle) for bundle in bundles]
+    parents = list(range(len(bundles)))
+
+    def find(i: int) -> int:
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    feeds: dict[int, set[int]] = {i: set() for i in range(len(bundles))}
+    for i, (_, outputs_i) in enumerate(paths):
+        for j, (sources_j, outputs_j) in enumerate(paths):
+            if i == j:
+                continue
+            if outputs_i & sources_j:
+                feeds[i].add(j)
+                parents[find(i)] = find(j)
+            elif outputs_i & outputs_j:
+                parents[find(i)] = find(j)
+
+    groups: dict[int, list[int]] = {}
+    for i in range(len(bundles)):
+        groups.setdefault(find(i), []).append(i)
+
+    ordered = []
+    for members in groups.values():
+        # Kahn's algorithm, falling back to registration order on cycles.
+        pending = {i: sum(i in feeds[j] for j in members) for i in members}
+        order: list[int] = []
+        while pending:
+            ready = [i for i in members if pending.get(i) == 0] or [min(pending)]
+            current = ready[0]
+            del pending[current]
+            order.append(current)
+            for j in feeds[current]:
+                if j in pending:
+                    pending[j] -= 1
+        ordered.append(order)
+    return ordered
+
+
+def _all_bundles(env: Any) -> list[tuple[str | None, Any]]:
+    """Return ``(name, bundle)`` pairs for all bundles of ``env``, in order.
+
+    The name of a bundle which was not registered by name is ``None``.
+    """
+    named = {id(b): n for n, b in env._named_bundles.items()}
+    return [(named.get(id(b)), b) for b in env]
+
+
+def _use_replacing_cache(env: Any) -> None:
+    """Let several builders share the filesystem cache of ``env``."""
+    if isinstance(env.cache, FilesystemCache):
+        env.cache = _ReplacingFilesystemCache(env.cache.directory, env.cache.new_file_mode)
+
+
+def _call_in_app_context(app: Quart, func: Callable[[], Any]) -> Any:
+    """Call ``func`` in an app context of ``app`` and return its result.
+
+    ``func`` runs on the calling thread, outside of any event loop, so that
+    async filters can be run by the builds it makes and it can be
+    interrupted as usual. The context is entered and left by an event loop
+    on another thread.
+    """
+    entered: Future[contextvars.Context] = Future()
+    done = threading.Event()
+
+    async def _hold_context() -> None:
+        try:
+            async with app.app_context():  # ty: ignore[invalid-context-manager]
+                entered.set_result(contextvars.copy_context())
+                await asyncio.to_thread(done.wait)
+        except BaseException as error:
+            if not entered.done():
+                entered.set_exception(error)
+            raise
+
+    thread = threading.Thread(target=asyncio.run, args=(_hold_context(),), daemon=True)
+    thread.start()
+    try:
+        return entered.result().run(func)
+    finally:
+        done.set()
+        thread.join()
+
+
+# The app and all bundles of a parallel build. Each worker process loads
+# the app itself; worker threads share the one of the build command.
+_parallel_build_state: tuple[Quart, list[tuple[str | None, Any]]] | None = None
+
+
+def _init_build_worker(app_import_path: str | None, create_app: Any) -> None:
+    """Load the app in a process of a parallel build, as the CLI did."""
+    global _parallel_build_state
+    app = ScriptInfo(app_import_path, create_app).load_app()
+    env = app.jinja_env.assets_environment  # ty: ignore[unresolved-attribute]
+    _use_replacing_cache(env)
+    _parallel_build_state = (app, _all_bundles(env))
+
+
+def _build_bundles(
+    env: Any, bundles: list[tuple[str | None, Any]], no_cache: bool
+) -> list[tuple[str, float, str | None]]:
+    """Build the given ``(name, bundle)`` pairs one after another.
+
+    Returns a ``(label, seconds, error)`` tuple for each bundle.
+    """
+    results = []
+    for name, bundle in bundles:
+        error = None
+        start = time.perf_counter()
+        try:
+            with bundle.bind(env):
+                bundle.build(force=True, disable_cache=no_cache)
+        except BuildError as e:
+            error = str(e)
+        results.append((name or bundle.output, time.perf_counter() - start, error))
+    return results
+
+
+def _build_group(indexes: list[int], no_cache: bool) -> list[tuple[str, float, str | None]]:
+    """Build the bundles of a parallel build at ``indexes`` of
+    :func:`_all_bundles`, in a new app context."""
+    assert _parallel_build_state is not None
+    app, bundles = _parallel_build_state
+    env = app.jinja_env.assets_environment  # ty: ignore[unresolved-attribute]
+
+    return _call_in_app_context(
+        app, lambda: _build_bundles(env, [bundles[index] for index in indexes], no_cache)
+    )
+
+
+def _precompress(cache: Any, directory: str, filename: str, encoding: str) -> bool:
+    """Write a compressed copy of ``filename`` next to it.
+
+    The digests of the file and its copy are kept in ``cache``, if any, so
+    an up to date copy is left alone. Returns whether a copy was written.
+    """
+    sidecar = filename + COMPRESSION_SUFFIXES[encoding]
+    output_digest = _file_digest(filename)
+    key = ("precompress", encoding, path.relpath(filename, directory).replace("\\", "/"))
+    if cache:
+        try:
+            if cache.get(key) == (output_digest, _file_digest(sidecar)):
+                # Mark the copy as current for a rewritten, unchanged output.
+                os.utime(sidecar)
+                return False
+        except OSError:
+            pass
+
+    with open(filename, "rb") as f:
+        _write_atomic(sidecar, _compress(encoding, f.read()))
+    if cache:
+        cache.set(key, (output_digest, _file_digest(sidecar)))
+    return True
+
+
+class QuartBuildCommand(BuildCommand):
+    """The webassets build command, with support for building in parallel.
+
+    When the environment uses the :class:`ContentHashUpdater`, bundles
+    whose sources are unchanged since they were last built are skipped.
+    Builds which do neither are left to webassets' own command.
+    Outputs can be precompressed for servers which serve ``.gz`` and
+    ``.br`` files as is.
+    """
+
+    def __call__(
+        self,
+        bundles: list[str] | None = None,
+        output: Any = None,
+        directory: str | None = None,
+        no_cache: bool | None = None,
+        manifest: Any = None,
+        production: bool | None = None,
+        jobs: int = 1,
+        url_manifest: str | None = None,
+        force: bool = False,
+        precompress: list[str] | None = None,
+        script_info: ScriptInfo | None = None,
+    ) -> int | None:
+        if output or directory or manifest or production:
+            if jobs != 1:
+                raise CommandError(
+                    "Custom outputs, directories, manifests and production mode "
+                    "are not supported when building in parallel."
+                )
+            if precompress and (output or directory):
+                raise CommandError("Custom outputs and directories cannot be precompressed.")
+            result = super().__call__(bundles, output, directory, no_cache, manifest, production)
+        elif jobs == 1 and (force or not isinstance(self.environment.updater, ContentHashUpdater)):
+            # Nothing to run in parallel or to skip: build as webassets does.
+            result = super().__call__(bundles, no_cache=no_cache)
+        else:
+            result = self.build_bundles(
+                bundles, jobs or os.cpu_count() or 1, no_cache, force, script_info
+            )
+
+        if precompress and not result:
+            self.precompress(bundles, precompress)
+        if url_manifest and not result:
+            self.environment.write_url_manifest(url_manifest, bundles)
+            self.log.info(f"Wrote URL manifest: {url_manifest}")
+        return result
+
+    def build_bundles(
+        self,
+        bundle_names: list[str] | None,
+        jobs: int = 1,
+        no_cache: bool | None = None,
+        force: bool = False,
+        script_info: ScriptInfo | None = None,
+    ) -> int | None:
+        """Build bundles, concurrently if ``jobs`` is more than one.
+
+        Independent bundles are built by worker processes, which load the
+        app as given by ``script_info``, or by threads if there is no
+        ``script_info`` or it cannot be passed to another process. Unless
+        ``force`` is set, bundles which the content hash updater finds up to
+        date are skipped.
+        """
+        global _parallel_build_state
+
+        env = self.environment
+        to_build = self._select_bundles(bundle_names)
+        _use_replacing_cache(env)
+
+        if not force and isinstance(env.updater, ContentHashUpdater):
+            changed = []
+            for name, bundle in to_build:
+                if env.updater.is_up_to_date(bundle, env):
+                    self.log.info(f"Unchanged bundle: {name or bundle.output}")
+                else:
+                    changed.append((name, bundle))
+            to_build = changed
+
+        groups = _plan_build_groups(env, [b for _, b in to_build])
+        failed = 0
+        if jobs == 1 or len(groups) < 2:
+            for group in groups:
+                failed += self._report(
+                    _build_bundles(env, [to_build[i] for i in group], bool(no_cache))
+                )
+        else:
+            self.log.info(f"Building {len(to_build)} bundles using {jobs} workers")
+            # Workers find the bundles by their position in the environment.
+            all_bundles = _all_bundles(env)
+            positions = {id(bundle): i for i, (_, bundle) in enumerate(all_bundles)}
+            groups = [[positions[id(to_build[i][1])] for i in group] for group in groups]
+            build_group = functools.partial(_build_group, no_cache=bool(no_cache))
+
+            loader = None
+            if script_info is not None:
+                loader = (script_info.app_import_path, script_info.create_app)
+                try:
+                    pickle.dumps(loader)
+                except (pickle.PicklingError, AttributeError, TypeError):
+                    loader = None
+            if loader is not None:
+                # Spawned, not forked: the build may already have started threads.
+                executor: Executor = ProcessPoolExecutor(
+                    max_workers=jobs,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_build_worker,
+                    initargs=loader,
+                )
+            else:
+                executor = ThreadPoolExecutor(max_workers=jobs)
+            _parallel_build_state = (env._app, all_bundles)
+            try:
+                with executor:
+                    for results in executor.map(build_group, groups):
+                        failed += self._report(results)
+            finally:
+                _parallel_build_state = None
+
+        if failed != len(to_build):
+            self.event_handlers["post_build"]()
+        if failed:
+            return 2
+        return None
+
+    def precompress(self, bundle_names: list[str] | None, encodings: list[str]) -> None:
+        """Write compressed copies of the outputs of bundles next to them.
+
+        ``encodings`` are keys of :data:`COMPRESSION_SUFFIXES`. Files are
+        compressed in parallel, and copies made from the current contents
+        of an output are kept.
+        """
+        env = self.environment
+        outputs = set()
+        for _, bundle in self._select_bundles(bundle_names):
+            outputs |= _bundle_paths(env, bundle)[1]
+        tasks = [(o, e) for o in sorted(outputs) if path.isfile(o) for e in encodings]
+
+        cache, directory = env.cache, env.directory
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            written = sum(executor.map(lambda task: _precompress(cache, directory, *task), tasks))
+        self.log.info(f"Precompressed {written} files, {len(tasks) - written} unchanged")
+
+    def _select_bundles(self, bundle_names: list[str] | None) -> list[tuple[str | None, Any]]:
+        """Return ``(name, bundle)`` pairs for the given names, or all bundles."""
+        env = self.environment
+        if bundle_names:
+            for name in bundle_names:
+                if name not in env:
+                    raise CommandError(f'I do not know a bundle name named "{name}".')
+            return [(n, b) for n, b in env._named_bundles.items() if n in bundle_names]
+        return _all_bundles(env)
+
+    def _report(self, results: list[tuple[str, float, str | None]]) -> int:
+        """Log the results of :func:`_build_bundles`; returns the number of failures."""
+        failed = 0
+        for label, elapsed, error in results:
+            if error is None:
+                self.log.info(f"Built bundle: {label} ({elapsed:.2f}s)")
+            else:
+                failed += 1
+                self.log.error(f"Failed to build {label}, error was: {error}")
+        return failed
+
+
+def _watch_index(
+    env: Any, bundles: list[Any], refresh: bool = False
+) -> tuple[dict[str, set[Any]], set[str]]:
+    """Map the source files of ``bundles`` to the bundles reading them.
+
+    The output files are returned as well, so that writing them is not
+    mistaken for a change to an unknown file. ``refresh`` is passed on to
+    :func:`_bundle_paths`.
+    """
+    index: dict[str, set[Any]] = {}
+    outputs: set[str] = set()
+    for bundle in bundles:
+        sources, bundle_outputs = _bundle_paths(env, bundle, refresh)
+        for source in sources:
+            index.setdefault(source, set()).add(bundle)
+        outputs |= bundle_outputs
+    return index, outputs
+
+
+class QuartWatchCommand(WatchCommand):
+    """The webassets watch command, driven by filesystem events.
+
+    Changes are reported by ``watchfiles`` (inotify on Linux) when it is
+    installed, and found by polling modification times otherwise. Changed
+    paths are mapped back to the bundles reading them, and only those
+    bundles are rebuilt.
+    """
+
+    def __call__(
+        self,
+        loop: Callable[[], Any] | None = None,
+        debounce: float = 0.1,
+        poll: bool = False,
+    ) -> None:
+        """Watch assets for changes.
+
+        ``loop`` is called once every iteration, as in webassets; watching
+        stops when it returns a true value. Changes are collected until
+        none has been seen for ``debounce`` seconds, so that a burst of
+        saves or a checkout rebuilds each bundle once. ``poll`` forces
+        polling even if ``watchfiles`` is available.
+        """
+        bundles = list(self.environment)
+        try:
+            for bundle in bundles:
+                self.log.info(f"Bringing up to date: {bundle.output}")
+                bundle.build(force=False)
+
+            self._index, self._outputs = _watch_index(self.environment, bundles)
+            self._cache_directory = None
+            if isinstance(self.environment.cache, FilesystemCache):
+                self._cache_directory = path.normpath(self.environment.cache.directory)
+            if poll:
+                events = self._poll_changes(loop, debounce)
+            else:
+                events = self._watch_changes(loop, debounce)
+
+            self.log.info(f"Watching {len(bundles)} bundles for changes...")
+            for changed in events:
+                if changed:
+                    self.build_changed(bundles, self.update_index(bundles, changed))
+                if loop and loop():
+                    break
+        except KeyboardInterrupt:
+            pass
+
+    def update_index(self, bundles: list[Any], changed: set[str]) -> set[Any]:
+        """Return the bundles affected by the ``changed`` paths.
+
+        A path which is not a known source or output may be a file added to
+        a glob, so the index is rebuilt and bundles whose sources were added
+        or removed are affected as well.
+        """
+        affected: set[Any] = set()
+        unknown = False
+        for changed_path in changed:
+            if changed_path in self._index:
+                affected |= self._index[changed_path]
+            elif not (
+                changed_path in self._outputs
+                or self._is_output_artifact(changed_path)
+                or self._is_cached(changed_path)
+            ):
+                unknown = True
+
+        if unknown:
+            # Directory listings may be stale if their mtime did not change.
+            forget = getattr(self.environment.resolver, "clear_directory_index", None)
+            if forget is not None:
+                for changed_path in changed:
+                    forget(path.dirname(changed_path))
+            index, self._outputs = _watch_index(self.environment, bundles, refresh=True)
+            for source in index.keys() ^ self._index.keys():
+                affected |= index.get(source) or self._index[source]
+            self._index = index
+        return affected
+
+    def _is_output_artifact(self, changed_path: str) -> bool:
+        """Whether ``changed_path`` is the build lock, a temporary file or a
+        compressed copy of a known output."""
+        directory, name = path.split(changed_path)
+        if name.endswith(".lock") and name.startswith("."):
+            output = name[1:-5]
+        elif name.endswith(".tmp") and name.startswith("."):
+            output = name[1:-4].rpartition(".")[0]
+        else:
+            output, suffix = path.splitext(name)
+            if suffix not in COMPRESSION_SUFFIXES.values():
+                return False
+        return path.join(directory, output) in self._outputs
+
+    def _is_cached(self, changed_path: str) -> bool:
+        """Whether ``changed_path`` is inside the webassets cache directory."""
+        cache_directory = self._cache_directory
+        return cache_directory is not None and (
+            path.commonpath([cache_directory, changed_path]) == cache_directory
+        )
+
+    def build_changed(self, bundles: list[Any], affected: set[Any]) -> None:
+        """Rebuild the ``affected`` bundles, in registration order."""
+        built = 0
+        for bundle in bundles:
+            if bundle not in affected:
+                continue
+            try:
+                bundle.build(force=True)
+            except BuildError as e:
+                self.log.error(f"Failed to build {bundle.output}, error was: {e}")
+            else:
+                built += 1
+                self.log.info(f"Built bundle: {bundle.output}")
+        if built:
+            self.event_handlers["post_build"]()
+
+    def _watched_directories(self) -> list[str]:
+        """Return the outermost existing directories holding source files."""
+        roots: list[str] = []
+        for directory in sorted({path.dirname(source) for source in self._index}):
+            if not path.isdir(directory):
+                continue
+            if roots and path.commonpath([roots[-1], directory]) == roots[-1]:
+                continue
+            roots.append(directory)
+        return roots
+
+    def _watch_changes(self, loop: Callable[[], Any] | None, debounce: float) -> Iterator[set[str]]:
+        """Yield the paths changed according to filesystem events.
+
+        The watcher is restarted if sources appear in new directories.
+        Falls back to :meth:`_poll_changes` if ``watchfiles`` is missing.
+        """
+        try:
+            from watchfiles import watch
+        except ImportError:
+            self.log.debug("watchfiles is not installed, polling for changes")
+            yield from self._poll_changes(loop, debounce)
+            return
+
+        while True:
+            roots = self._watched_directories()
+            if not roots:
+                yield from self._poll_changes(loop, debounce)
+                return
+            for changes in watch(
+                *roots,
+                step=max(int(debounce * 1000), 1),
+                rust_timeout=100 if loop else 5000,
+                yield_on_timeout=loop is not None,
+                raise_interrupt=True,
+            ):
+                yield {path.normpath(changed_path) for _, changed_path in changes}
+                if self._watched_directories() != roots:
+                    break
+
+    def _poll_changes(self, loop: Callable[[], Any] | None, debounce: float) -> Iterator[set[str]]:
+        """Yield the paths changed according to their modification times.
+
+        Directories are polled as well, since adding or removing a file
+        changes the modification time of its directory.
+        """
+
+        def scan() -> dict[str, int]:
+            mtimes = {}
+            for source in {*self._index, *map(path.dirname, self._index)}:
+                try:
+                    mtimes[source] = os.stat(source).st_mtime_ns
+                except OSError:
+                    mtimes[source] = 0
+            return mtimes
+
+        mtimes = scan()
+        pending: set[str] = set()
+        last_change = 0.0
+        while True:
+            current = scan()
+            changed = {p for p, mtime in current.items() if mtimes.get(p, mtime) != mtime}
+            changed |= mtimes.keys() - current.keys()
+            mtimes.update(current)
+            if changed:
+                pending |= changed
+                last_change = time.monotonic()
+            if pending and time.monotonic() - last_change >= debounce:
+                yield pending
+                pending = set()
+                mtimes = scan()
+            else:
+                yield set()
+            if not loop:
+                time.sleep(0.1)
+
+
+def _webassets_cmd(cmd: str, info: ScriptInfo, **kwargs: Any) -> None:
     """Helper to run a webassets command."""
     app = info.load_app()
 
@@ -373,15 +3173,36 @@ def _webassets_cmd(cmd: str, info: ScriptInfo) -> None:
         logger.addHandler(logging.StreamHandler())
     logger.setLevel(logging.DEBUG)
 
-    async def _run_with_app_context() -> None:
-        async with app.app_context():  # ty: ignore[invalid-context-manager]
-            cmdenv = CommandLineEnvironment(
-                app.jinja_env.assets_environment,  # ty: ignore[unresolved-attribute]
-                logger,
-            )
-            getattr(cmdenv, cmd)()
-
-    asyncio.run(_run_with_app_context())
+    def _run() -> None:
+        cmdenv = CommandLineEnvironment(
+            app.jinja_env.assets_environment,  # ty: ignore[unresolved-attribute]
+            logger,
+            commands={"build": QuartBuildCommand, "watch": QuartWatchCommand},
+        )
+        getattr(cmdenv, cmd)(**kwargs)
+
+    _call_in_app_context(app, _run)
+
+
+def _parse_encodings(
+    ctx: click.Context, param: click.Parameter, value: str | None
+) -> list[str] | None:
+    """Parse a comma-separated list of encodings to precompress with."""
+    if not value:
+        return None
+    encodings = [encoding.strip() for encoding in value.split(",") if encoding.strip()]
+    for encoding in encodings:
+        if encoding not in COMPRESSION_SUFFIXES:
+            choices = ", ".join(COMPRESSION_SUFFIXES)
+            raise click.BadParameter(f"unknown encoding {encoding!r}, use one of: {choices}")
+    if "br" in encodings:
+        try:
+            import brotli  # noqa: F401
+        except ImportError:
+            raise click.BadParameter(
+                "brotli is not installed, install quart-assets[brotli]"
+            ) from None
+    return encodings
 
 
 @click.group()
@@ -390,10 +3211,49 @@ def assets() -> None:
 
 
 @assets.command()
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=0),
+    default=1,
+    show_default=True,
+    help="Number of bundles to build in parallel; 0 uses one per CPU.",
+)
+@click.option(
+    "--manifest",
+    "url_manifest",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write the URLs and SRI hashes of all named bundles to this file.",
+)
+@click.option(
+    "--precompress",
+    metavar="ENCODINGS",
+    callback=_parse_encodings,
+    help="Also write .gz and/or .br copies of outputs, e.g. 'gzip,br'.",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Rebuild bundles which the content hash updater finds unchanged.",
+)
 @pass_script_info
-def build(info: ScriptInfo) -> None:
+def build(
+    info: ScriptInfo,
+    jobs: int,
+    url_manifest: str | None,
+    precompress: list[str] | None,
+    force: bool,
+) -> None:
     """Build bundles."""
-    _webassets_cmd("build", info)
+    _webassets_cmd(
+        "build",
+        info,
+        jobs=jobs,
+        url_manifest=url_manifest,
+        precompress=precompress,
+        force=force,
+        script_info=info,
+    )
 
 
 @assets.command()
@@ -404,7 +3264,79 @@ def clean(info: ScriptInfo) -> None:
 
 
 @assets.command()
+@click.option(
+    "--debounce",
+    type=click.FloatRange(min=0),
+    default=0.1,
+    show_default=True,
+    help="Seconds to wait for further changes before rebuilding.",
+)
+@click.option("--poll", is_flag=True, help="Poll for changes instead of using filesystem events.")
 @pass_script_info
-def watch(info: ScriptInfo) -> None:
+def watch(info: ScriptInfo, debounce: float, poll: bool) -> None:
     """Watch bundles for file changes."""
-    _webassets_cmd("watch", info)
+    _webassets_cmd("watch", info, debounce=debounce, poll=poll)
+
+
+@assets.command()
+@click.option(
+    "--rebuild",
+    is_flag=True,
+    help="Rebuild all bundles without the cache first, to include filter times.",
+)
+@click.option(
+    "-n",
+    "--limit",
+    type=click.IntRange(min=1),
+    default=20,
+    show_default=True,
+    help="Number of hot spots to print.",
+)
+@click.option("--prometheus", is_flag=True, help="Print all timings in the Prometheus text format.")
+@pass_script_info
+def stats(info: ScriptInfo, rebuild: bool, limit: int, prometheus: bool) -> None:
+    """Time the asset pipeline and print its hot spots.
+
+    Every named bundle is prepared as by the startup warmup: built if out of
+    date, and its URLs and SRI hashes resolved.
+    """
+    app = info.load_app()
+    env = getattr(app.jinja_env, "assets_environment", None)
+    if env is None:
+        raise RuntimeError(
+            "No assets environment found. Make sure you've "
+            + "initialized QuartAssets with your app."
+        )
+
+    metrics = AssetMetrics()
+    env.add_metrics_hook(metrics)
+
+    def _rebuild() -> None:
+        for label, _, error in _build_bundles(env, list(env._named_bundles.items()), no_cache=True):
+            if error is not None:
+                click.echo(f"Failed to build {label}, error was: {error}", err=True)
+
+    async def _run() -> None:
+        async with app.app_context():  # ty: ignore[invalid-context-manager]
+            await env.warmup(app)
+
+    try:
+        if rebuild:
+            _call_in_app_context(app, _rebuild)
+        asyncio.run(_run())
+    finally:
+        env.remove_metrics_hook(metrics)
+
+    if prometheus:
+        click.echo(metrics.prometheus(), nl=False)
+        return
+
+    rows = metrics.hot_spots(limit)
+    width = min(max([len(row["label"]) for row in rows] + [5]), 60)
+    click.echo(f"{'Operation':<10} {'Label':<{width}} {'Count':>6} {'Total ms':>10} {'Mean ms':>9}")
+    for row in rows:
+        label = row["label"] if len(row["label"]) <= width else "..." + row["label"][3 - width :]
+        click.echo(
+            f"{row['operation']:<10} {label:<{width}} {row['count']:>6} "
+            f"{row['total'] * 1000:>10.2f} {row['mean'] * 1000:>9.2f}"
+        )
@@ -0,0 +1,92 @@
+"""Benchmarks for ``quart assets build`` and the memory used by large builds.
+
+Run with ``uv run --group bench pytest -m bench tests/benchmarks``.
+"""
+
+import tracemalloc
+from pathlib import Path
+from typing import Any
+
+import pytest
+from click.testing import CliRunner
+from quart import Quart
+from quart.cli import ScriptInfo
+
+from quart_assets import Bundle, ContentHashUpdater, QuartAssets
+from quart_assets.extension import build
+
+pytest.importorskip("pytest_benchmark")
+
+pytestmark = pytest.mark.bench
+
+BUNDLES = 20
+# Sources of the large bundle: 8 files of 1 MiB each.
+LARGE_SOURCES = 8
+LARGE_SOURCE_SIZE = 1024 * 1024
+
+
+def _make_app(tmp_path: Path, files: int, size: int) -> tuple[Quart, QuartAssets]:
+    app = Quart(__name__)
+    app.static_folder = str(tmp_path)
+    env = QuartAssets(app)
+    line = "var x = 1;\n"
+    for i in range(files):
+        (tmp_path / f"src{i}.js").write_text(line * (size // len(line)), encoding="utf-8")
+    return app, env
+
+
+@pytest.fixture
+def build_app(tmp_path: Path) -> Quart:
+    """An app with several bundles sharing a pool of source files."""
+    app, env = _make_app(tmp_path, 10, 20 * 1024)
+    env.updater = ContentHashUpdater()
+    for i in range(BUNDLES):
+        sources = [f"src{(i + j) % 10}.js" for j in range(4)]
+        env.register(f"bundle{i}", Bundle(*sources, output=f"out/bundle{i}.js"))
+    return app
+
+
+def _build(app: Quart, *args: str) -> None:
+    result = CliRunner().invoke(build, list(args), obj=ScriptInfo(create_app=lambda: app))
+    assert result.exit_code == 0, result.output
+
+
+def test_build_cold(benchmark: Any, build_app: Quart) -> None:
+    """Build every bundle from scratch, without the filter cache."""
+    build_app.config["ASSETS_CACHE"] = False
+    build_app.config["ASSETS_MANIFEST"] = False
+    benchmark(_build, build_app, "--force")
+
+
+def test_build_warm(benchmark: Any, build_app: Quart) -> None:
+    """Build when no source has changed since the last build."""
+    _build(build_app)
+    benchmark(_build, build_app)
+
+
+@pytest.mark.parametrize("streaming", [False, True], ids=["in-memory", "streaming"])
+def test_build_memory(benchmark: Any, tmp_path: Path, streaming: bool) -> None:
+    """Peak memory of building one large bundle; see ``extra_info``."""
+    app, env = _make_app(tmp_path, LARGE_SOURCES, LARGE_SOURCE_SIZE)
+    env.cache = False
+    env.manifest = False
+    env.versions = False
+    env.streaming = streaming
+    bundle = Bundle(*(f"src{i}.js" for i in range(LARGE_SOURCES)), output="large.js")
+    env.register("large", bundle)
+
+    def measure() -> int:
+        tracemalloc.start()
+        try:
+            bundle.build(force=True)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    peak = benchmark.pedantic(measure, rounds=3)
+    benchmark.extra_info["peak_bytes"] = peak
+    total = LARGE_SOURCES * LARGE_SOURCE_SIZE
+    if streaming:
+        assert peak < total / 4
+    else:
+        assert peak > total
@@ -0,0 +1,32 @@
+"""Benchmarks for reading the environment config.
+
+Run with ``uv run --group bench pytest -m bench tests/benchmarks``.
+"""
+
+from typing import Any
+
+import pytest
+from quart import Quart
+
+from quart_assets import QuartAssets
+
+pytest.importorskip("pytest_benchmark")
+
+pytestmark = pytest.mark.bench
+
+KEYS = ["debug", "auto_build", "url", "directory", "cache", "manifest", "versions", "load_path"]
+
+
+@pytest.mark.parametrize("frozen", [False, True], ids=["live", "frozen"])
+def test_config_reads(benchmark: Any, frozen: bool) -> None:
+    env = QuartAssets(Quart(__name__))
+    if frozen:
+        env.config.freeze()
+    config = env.config
+
+    def read() -> None:
+        for _ in range(100):
+            for key in KEYS:
+                config.get(key)
+
+    benchmark(read)
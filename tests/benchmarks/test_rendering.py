@@ -0,0 +1,117 @@
+"""Benchmarks for rendering ``{% assets %}`` tags.
+
+Run with ``uv run --group bench pytest -m bench tests/benchmarks``.
+"""
+
+import asyncio
+from pathlib import Path
+from typing import Any
+
+import pytest
+from jinja2 import Environment
+from quart import Quart
+
+from quart_assets import AsyncAssetsExtension, Bundle, QuartAssets
+
+pytest.importorskip("pytest_benchmark")
+
+pytestmark = pytest.mark.bench
+
+BUNDLES = 50
+
+TEMPLATE = "".join(
+    f"{{% assets 'bundle{i}' %}}<script src='{{{{ ASSET_URL }}}}'></script>{{% endassets %}}"
+    for i in range(BUNDLES)
+)
+
+
+@pytest.fixture
+def bundles_env(tmp_path: Path) -> QuartAssets:
+    """An app with many built bundles of a few source files each."""
+    app = Quart(__name__)
+    app.static_folder = str(tmp_path)
+    env = QuartAssets(app)
+    for i in range(BUNDLES):
+        sources = []
+        for j in range(3):
+            source = tmp_path / f"src{i}_{j}.js"
+            source.write_text(f"var x{i}_{j} = {j};\n" * 20, encoding="utf-8")
+            sources.append(source.name)
+        env.register(f"bundle{i}", Bundle(*sources, output=f"out/bundle{i}.js"))
+    for bundle in env:
+        bundle.build()
+    return env
+
+
+@pytest.mark.parametrize("auto_build", [False, True], ids=["cached", "auto-build"])
+def test_render_sync(benchmark: Any, bundles_env: QuartAssets, auto_build: bool) -> None:
+    """Render with a synchronous Jinja environment, outside a request."""
+    bundles_env.auto_build = auto_build
+    jinja_env = Environment(extensions=[AsyncAssetsExtension])
+    jinja_env.assets_environment = bundles_env  # ty: ignore[unresolved-attribute]
+    template = jinja_env.from_string(TEMPLATE)
+
+    result = benchmark(template.render)
+    assert result.count("<script") == BUNDLES
+
+
+def test_render_precompiled(benchmark: Any, bundles_env: QuartAssets) -> None:
+    """Render tags which were resolved when the template was compiled."""
+    bundles_env.auto_build = False
+    bundles_env.precompile_tags = True
+    jinja_env = Environment(extensions=[AsyncAssetsExtension])
+    jinja_env.assets_environment = bundles_env  # ty: ignore[unresolved-attribute]
+    template = jinja_env.from_string(TEMPLATE)
+
+    result = benchmark(template.render)
+    assert result.count("<script") == BUNDLES
+
+
+@pytest.mark.parametrize("auto_build", [False, True], ids=["cached", "auto-build"])
+def test_render_async(benchmark: Any, bundles_env: QuartAssets, auto_build: bool) -> None:
+    """Render with Quart's async Jinja environment, inside a request."""
+    bundles_env.auto_build = auto_build
+    app = bundles_env._app
+    template = app.jinja_env.from_string(TEMPLATE)
+    loop = asyncio.new_event_loop()
+
+    async def render() -> str:
+        async with app.test_request_context("/"):  # ty: ignore[invalid-context-manager]
+            return await template.render_async()
+
+    try:
+        result = benchmark(lambda: loop.run_until_complete(render()))
+    finally:
+        loop.close()
+    assert result.count("<script") == BUNDLES
+
+
+def test_render_unbound(benchmark: Any, tmp_path: Path) -> None:
+    """Render with an environment set up by an app factory, inside a request."""
+    app = Quart(__name__)
+    app.static_folder = str(tmp_path)
+    env = QuartAssets()
+    env.init_app(app)
+    for i in range(BUNDLES):
+        source = tmp_path / f"src{i}.js"
+        source.write_text(f"var x{i} = {i};\n", encoding="utf-8")
+        env.register(f"bundle{i}", Bundle(source.name, output=f"out/bundle{i}.js"))
+    template = app.jinja_env.from_string(TEMPLATE)
+    loop = asyncio.new_event_loop()
+
+    async def build() -> None:
+        async with app.app_context():  # ty: ignore[invalid-context-manager]
+            env.auto_build = False
+            for bundle in env:
+                bundle.build()
+
+    async def render() -> str:
+        async with app.test_request_context("/"):  # ty: ignore[invalid-context-manager]
+            return await template.render_async()
+
+    try:
+        loop.run_until_complete(build())
+        result = benchmark(lambda: loop.run_until_complete(render()))
+    finally:
+        loop.close()
+    assert result.count("<script") == BUNDLES
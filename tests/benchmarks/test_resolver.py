@@ -0,0 +1,105 @@
+"""Benchmarks for resolving blueprint-prefixed assets.
+
+Run with ``uv run --group bench pytest -m bench tests/benchmarks``.
+"""
+
+import asyncio
+from pathlib import Path
+from typing import Any
+
+import pytest
+from quart import Blueprint, Quart
+
+from quart_assets import Bundle, QuartAssets
+
+pytest.importorskip("pytest_benchmark")
+
+pytestmark = pytest.mark.bench
+
+BLUEPRINTS = 200
+
+
+@pytest.fixture
+def blueprint_items(tmp_path: Path) -> tuple[QuartAssets, list[str]]:
+    """An app with many blueprints, and one asset path per blueprint."""
+    app = Quart(__name__)
+    app.static_folder = str(tmp_path / "static")
+    items = []
+    for i in range(BLUEPRINTS):
+        static_folder = tmp_path / f"bp{i}"
+        static_folder.mkdir()
+        (static_folder / "app.js").write_text("", encoding="utf-8")
+        app.register_blueprint(
+            Blueprint(f"bp{i}", __name__, static_folder=str(static_folder), url_prefix=f"/bp{i}")
+        )
+        items.append(f"bp{i}/app.js")
+    return QuartAssets(app), items
+
+
+def test_split_prefix(benchmark: Any, blueprint_items: tuple[QuartAssets, list[str]]) -> None:
+    env, items = blueprint_items
+    resolver = env.resolver
+
+    def resolve() -> None:
+        for item in items:
+            resolver.split_prefix(env, item)
+
+    benchmark(resolve)
+
+
+def test_search_for_source(benchmark: Any, blueprint_items: tuple[QuartAssets, list[str]]) -> None:
+    env, items = blueprint_items
+    resolver = env.resolver
+
+    def resolve() -> None:
+        for item in items:
+            resolver.search_for_source(env, item)
+
+    benchmark(resolve)
+
+
+def test_urls_outside_request_context(
+    benchmark: Any, blueprint_items: tuple[QuartAssets, list[str]]
+) -> None:
+    env, items = blueprint_items
+    bundles = [Bundle(item, env=env) for item in items]
+
+    def resolve() -> None:
+        for bundle in bundles:
+            bundle.urls()
+
+    benchmark(resolve)
+
+
+def test_urls_in_request_context(
+    benchmark: Any, blueprint_items: tuple[QuartAssets, list[str]]
+) -> None:
+    env, items = blueprint_items
+    bundles = [Bundle(item, env=env) for item in items]
+    app = env._app
+    loop = asyncio.new_event_loop()
+
+    async def resolve() -> None:
+        async with app.test_request_context("/"):  # ty: ignore[invalid-context-manager]
+            for bundle in bundles:
+                bundle.urls()
+
+    try:
+        benchmark(lambda: loop.run_until_complete(resolve()))
+    finally:
+        loop.close()
+
+
+def test_search_for_glob(benchmark: Any, tmp_path: Path) -> None:
+    """Expand a glob over a static folder with many directories."""
+    app = Quart(__name__)
+    app.static_folder = str(tmp_path)
+    for i in range(30):
+        directory = tmp_path / "js" / f"module{i}"
+        directory.mkdir(parents=True)
+        for j in range(40):
+            (directory / f"file{j}.js").write_text("", encoding="utf-8")
+    env = QuartAssets(app)
+
+    result = benchmark(env.resolver.search_for_source, env, "js/*/*.js")
+    assert len(result) == 1200
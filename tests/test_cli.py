@@ -1,4 +1,9 @@
+import asyncio
+import gzip
+import json
+import logging
 import os
+import re
 import subprocess
 import sys
 from pathlib import Path
@@ -8,9 +13,21 @@ import pytest
 from click.testing import CliRunner
 from quart import Blueprint, Quart
 from quart.cli import ScriptInfo
+from webassets.script import CommandLineEnvironment
 
-from quart_assets import Bundle, QuartAssets
-from quart_assets.extension import assets, build, clean, watch
+from quart_assets import AsyncFilter, Bundle, Jinja2Filter, QuartAssets
+from quart_assets.extension import (
+    _plan_build_groups,
+    _stat_file_digest,
+    _watch_index,
+    assets,
+    build,
+    clean,
+    QuartWatchCommand,
+    stats,
+    watch,
+)
+from tests.conftest import run_with_context
 
 
 def _invoke(cmd: Any, app: Quart, args: list[str] | None = None) -> Any:
@@ -60,6 +77,37 @@ def test_cli_build_creates_output(cli_app: Quart, temp_dir: str) -> None:
     assert os.path.exists(os.path.join(temp_dir, "combined.min.css"))
 
 
+def test_cli_build_serial(cli_app: Quart, caplog: pytest.LogCaptureFixture) -> None:
+    """A plain build is run by webassets' build command, as it logs."""
+    with caplog.at_level(logging.INFO, logger="webassets"):
+        result = _invoke(build, cli_app)
+    assert result.exit_code == 0, result.output
+    assert "Building bundle: combined.min.css" in caplog.text
+    assert "Built bundle" not in caplog.text
+
+
+class Jinja2OutputFilter(AsyncFilter):
+    """Renders the output of a bundle as a Quart template."""
+
+    async def output_async(self, _in: Any, out: Any, **kw: Any) -> None:
+        await Jinja2Filter().input_async(_in, out, **kw)
+
+
+@pytest.mark.parametrize("filters", ["jinja2,cssrewrite", Jinja2OutputFilter()])
+def test_cli_build_async_filters(cli_app: Quart, temp_dir: str, filters: Any) -> None:
+    """Async filters can run in builds made by the CLI."""
+    with open(os.path.join(temp_dir, "page.css"), "w", encoding="utf-8") as f:
+        f.write("/* {{ config.TITLE }} */")
+    cli_app.config["TITLE"] = "Assets"
+    env = cli_app.jinja_env.assets_environment  # ty: ignore[unresolved-attribute]
+    env.register("page", Bundle("page.css", filters=filters, output="page.out.css"))
+
+    result = _invoke(build, cli_app)
+    assert result.exit_code == 0, result.output
+    with open(os.path.join(temp_dir, "page.out.css"), encoding="utf-8") as f:
+        assert f.read() == "/* Assets */"
+
+
 def test_cli_clean_after_build(cli_app: Quart, temp_dir: str) -> None:
     build_result = _invoke(build, cli_app)
     assert build_result.exit_code == 0, build_result.output
@@ -106,3 +154,259 @@ def test_entrypoint_smoke() -> None:
 
     assert result.returncode == 0
     assert "Quart Assets commands" in result.stdout
+
+
+def test_cli_build_parallel(cli_app: Quart, temp_dir: str) -> None:
+    env = cli_app.jinja_env.assets_environment  # ty: ignore[unresolved-attribute]
+    env.register("css_bundle", Bundle("test.css", output="css.out"))
+    env.register("js_bundle", Bundle("test.js", output="js.out"))
+
+    result = _invoke(build, cli_app, ["--jobs", "2"])
+    assert result.exit_code == 0, result.output
+    for name in ("combined.min.css", "css.out", "js.out"):
+        assert os.path.exists(os.path.join(temp_dir, name))
+
+
+def test_cli_build_parallel_processes(temp_dir: str) -> None:
+    """An app loaded from a module is built by spawned worker processes."""
+    for name in ("test.css", "test.js"):
+        Path(temp_dir, name).write_text(name, encoding="utf-8")
+    Path(temp_dir, "assets_app.py").write_text(
+        """
+import os
+from pathlib import Path
+
+from quart import Quart
+
+from quart_assets import AsyncFilter, Bundle, Jinja2Filter, QuartAssets
+
+here = os.path.dirname(__file__)
+Path(here, f"loaded-{os.getpid()}").touch()
+app = Quart(__name__, static_folder=here)
+env = QuartAssets(app)
+env.register("css_bundle", Bundle("test.css", output="css.out"))
+env.add(Bundle("test.js", output="js.out"))
+""",
+        encoding="utf-8",
+    )
+    script_info = ScriptInfo(app_import_path=os.path.join(temp_dir, "assets_app.py:app"))
+
+    result = CliRunner().invoke(build, ["--jobs", "2"], obj=script_info)
+    assert result.exit_code == 0, result.output
+    assert _read(os.path.join(temp_dir, "css.out")) == "test.css"
+    assert _read(os.path.join(temp_dir, "js.out")) == "test.js"
+    # The CLI and at least one worker loaded the app.
+    assert len(list(Path(temp_dir).glob("loaded-*"))) > 1
+
+
+def test_cli_build_parallel_logs_timing(cli_app: Quart, caplog: pytest.LogCaptureFixture) -> None:
+    with caplog.at_level(logging.INFO, logger="webassets"):
+        result = _invoke(build, cli_app, ["--jobs", "2"])
+    assert result.exit_code == 0, result.output
+    assert re.search(r"Built bundle: test_bundle \(\d+\.\d\ds\)", caplog.text)
+
+
+def test_plan_build_groups(cli_app: Quart, temp_dir: str) -> None:
+    """Bundles sharing outputs, or consuming outputs, are built together in order."""
+    env = cli_app.jinja_env.assets_environment  # ty: ignore[unresolved-attribute]
+    consumer = Bundle("generated.css", output="final.css")
+    producer = Bundle("test.css", output="generated.css")
+    same_output = Bundle("test.js", output="final.css")
+    independent = Bundle("test.js", output="other.js")
+    for bundle in (consumer, producer, same_output, independent):
+        env.add(bundle)
+
+    groups = _plan_build_groups(env, [consumer, producer, same_output, independent])
+    assert sorted(groups) == [[1, 0, 2], [3]]
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_cli_build_writes_url_manifest(cli_app: Quart, temp_dir: str, jobs: str) -> None:
+    manifest_path = os.path.join(temp_dir, "manifest.json")
+    result = _invoke(build, cli_app, ["--jobs", jobs, "--manifest", manifest_path])
+    assert result.exit_code == 0, result.output
+
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert manifest["version"] == 1
+    (entry,) = manifest["bundles"]["test_bundle"]["urls"]
+    assert entry["url"].startswith("/static/combined.min.css")
+    assert entry["sri"].startswith("sha384-")
+    assert entry["size"] == os.path.getsize(os.path.join(temp_dir, "combined.min.css"))
+
+
+def _watch_until(app: Quart, done: Any, change: Any, **kwargs: Any) -> None:
+    """Run the watch command on ``app``, calling ``change`` once, until ``done()``."""
+    env = app.jinja_env.assets_environment  # ty: ignore[unresolved-attribute]
+    iterations = []
+
+    def loop() -> bool:
+        iterations.append(None)
+        if len(iterations) == 1:
+            change()
+        return done() or len(iterations) > 200
+
+    async def _run() -> None:
+        async with app.app_context():  # ty: ignore[invalid-context-manager]
+            cmdenv = CommandLineEnvironment(
+                env, logging.getLogger("webassets"), commands={"watch": QuartWatchCommand}
+            )
+            cmdenv.watch(loop=loop, debounce=0, **kwargs)
+
+    asyncio.run(_run())
+    assert done()
+
+
+def _read(filename: str) -> str:
+    with open(filename, encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("poll", [True, False])
+def test_watch_rebuilds_affected_bundles(
+    cli_app: Quart, temp_dir: str, caplog: pytest.LogCaptureFixture, poll: bool
+) -> None:
+    if not poll:
+        pytest.importorskip("watchfiles")
+    env = cli_app.jinja_env.assets_environment  # ty: ignore[unresolved-attribute]
+    env.register("js_bundle", Bundle("test.js", output="js.out"))
+    css_output = os.path.join(temp_dir, "combined.min.css")
+
+    def change() -> None:
+        with open(os.path.join(temp_dir, "test.css"), "w", encoding="utf-8") as f:
+            f.write("body { color: blue; }")
+
+    with caplog.at_level(logging.INFO, logger="webassets"):
+        _watch_until(
+            cli_app,
+            lambda: os.path.exists(css_output) and "blue" in _read(css_output),
+            change,
+            poll=poll,
+        )
+    assert "Built bundle: combined.min.css" in caplog.text
+    assert "Built bundle: js.out" not in caplog.text
+
+
+@pytest.mark.parametrize("poll", [True, False])
+def test_watch_picks_up_new_glob_matches(cli_app: Quart, temp_dir: str, poll: bool) -> None:
+    if not poll:
+        pytest.importorskip("watchfiles")
+    env = cli_app.jinja_env.assets_environment  # ty: ignore[unresolved-attribute]
+    env.register("glob_bundle", Bundle("*.css", output="glob.out"))
+    output = os.path.join(temp_dir, "glob.out")
+
+    def change() -> None:
+        with open(os.path.join(temp_dir, "added.css"), "w", encoding="utf-8") as f:
+            f.write(".added {}")
+
+    _watch_until(
+        cli_app, lambda: os.path.exists(output) and ".added" in _read(output), change, poll=poll
+    )
+
+
+def test_watch_ignores_output_artifacts(cli_app: Quart, temp_dir: str) -> None:
+    """Files written next to outputs by builds do not refresh the index."""
+    env = cli_app.jinja_env.assets_environment  # ty: ignore[unresolved-attribute]
+    command = QuartWatchCommand(CommandLineEnvironment(env, logging.getLogger("webassets")))
+    bundles = list(env)
+
+    def update_index(*names: str) -> bool:
+        """Return whether the index is refreshed for changes to ``names``."""
+        index = command._index
+        changed = {os.path.join(temp_dir, name) for name in names}
+        assert command.update_index(bundles, changed) == set()
+        return command._index is not index
+
+    command._cache_directory = None
+    command._index, command._outputs = run_with_context(cli_app, lambda: _watch_index(env, bundles))
+    artifacts = (
+        ".combined.min.css.lock",
+        ".combined.min.css.0123456789abcdef.tmp",
+        "combined.min.css.gz",
+        "combined.min.css.br",
+    )
+    assert not run_with_context(cli_app, lambda: update_index("combined.min.css", *artifacts))
+    assert run_with_context(cli_app, lambda: update_index(".other.css.lock"))
+
+
+def test_cli_build_skips_unchanged_bundles(
+    cli_app: Quart, temp_dir: str, caplog: pytest.LogCaptureFixture
+) -> None:
+    """The content hash updater skips bundles whose sources have the same bytes."""
+    env = cli_app.jinja_env.assets_environment  # ty: ignore[unresolved-attribute]
+    env.updater = "content_hash"
+    env.register("js_bundle", Bundle("test.js", output="js.out"))
+    assert _invoke(build, cli_app).exit_code == 0
+
+    # A fresh checkout: new timestamps, same contents, nothing in memory.
+    for name in ("test.css", "test.js", "combined.min.css", "js.out"):
+        os.utime(os.path.join(temp_dir, name), (1, 1))
+    _stat_file_digest.cache_clear()
+    with open(os.path.join(temp_dir, "test.css"), "w", encoding="utf-8") as f:
+        f.write("body { color: blue; }")
+
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger="webassets"):
+        assert _invoke(build, cli_app).exit_code == 0
+    assert "Built bundle: test_bundle" in caplog.text
+    assert "Unchanged bundle: js_bundle" in caplog.text
+
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger="webassets"):
+        assert _invoke(build, cli_app).exit_code == 0
+    assert "Unchanged bundle: test_bundle" in caplog.text
+    assert "Unchanged bundle: js_bundle" in caplog.text
+
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger="webassets"):
+        assert _invoke(build, cli_app, ["--force"]).exit_code == 0
+    assert "Unchanged bundle" not in caplog.text
+
+
+def test_cli_build_precompress(
+    cli_app: Quart, temp_dir: str, caplog: pytest.LogCaptureFixture
+) -> None:
+    output = os.path.join(temp_dir, "combined.min.css")
+    with caplog.at_level(logging.INFO, logger="webassets"):
+        result = _invoke(build, cli_app, ["--precompress", "gzip"])
+    assert result.exit_code == 0, result.output
+    assert "Precompressed 1 files, 0 unchanged" in caplog.text
+    with open(output, "rb") as f, gzip.open(output + ".gz") as g:
+        assert g.read() == f.read()
+    assert not os.path.exists(output + ".br")
+
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger="webassets"):
+        result = _invoke(build, cli_app, ["--precompress", "gzip"])
+    assert result.exit_code == 0, result.output
+    assert "Precompressed 0 files, 1 unchanged" in caplog.text
+
+
+def test_cli_build_precompress_brotli(cli_app: Quart, temp_dir: str) -> None:
+    brotli = pytest.importorskip("brotli")
+    result = _invoke(build, cli_app, ["--jobs", "2", "--precompress", "gzip,br"])
+    assert result.exit_code == 0, result.output
+
+    output = os.path.join(temp_dir, "combined.min.css")
+    with open(output, "rb") as f, open(output + ".br", "rb") as b:
+        assert brotli.decompress(b.read()) == f.read()
+    assert os.path.exists(output + ".gz")
+
+
+def test_cli_build_precompress_unknown_encoding(cli_app: Quart) -> None:
+    result = _invoke(build, cli_app, ["--precompress", "gzip,zstd"])
+    assert result.exit_code == 2
+    assert "unknown encoding 'zstd'" in result.output
+
+
+def test_stats_command(cli_app: Quart) -> None:
+    """`stats` times the pipeline and prints the hot spots."""
+    result = _invoke(stats, cli_app, ["--rebuild"])
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert lines[0].split() == ["Operation", "Label", "Count", "Total", "ms", "Mean", "ms"]
+    assert any(line.split()[:2] == ["build", "combined.min.css"] for line in lines[1:])
+
+    result = _invoke(stats, cli_app, ["--prometheus"])
+    assert result.exit_code == 0, result.output
+    assert result.output.startswith("# TYPE quart_assets_operation_seconds histogram")
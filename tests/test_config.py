@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 from quart import Quart
 
@@ -55,3 +57,38 @@ def test_config_isolation_within_apps(no_app_env: QuartAssets) -> None:
     app2 = Quart(__name__)
     result3 = run_with_context(app2, lambda: no_app_env.config["foo"])
     assert result3 == "bar"
+
+
+def test_frozen_config(app: Quart, env: QuartAssets, monkeypatch: pytest.MonkeyPatch) -> None:
+    app.config["ASSETS_URL"] = "/before"
+    app.config["LESS_PATH"] = "/usr/bin/less"
+    env.config.freeze()
+
+    app.config["ASSETS_URL"] = "/ignored"
+    with monkeypatch.context() as m:
+        # Frozen reads come from the snapshot without resolving the app.
+        m.setattr(QuartAssets, "_app", property(lambda self: pytest.fail("resolved app")))
+        assert env.url == "/before"
+    assert env.config["LESS_PATH"] == "/usr/bin/less"
+    with pytest.raises(KeyError):
+        _ = env.config["do_not_exist"]
+
+    env.url = "/after"
+    assert env.url == "/after"
+    assert app.config["ASSETS_URL"] == "/after"
+
+    app.config["ASSETS_URL"] = "/direct"
+    env.config.unfreeze()
+    assert env.url == "/direct"
+
+
+def test_freeze_config_before_serving(app: Quart) -> None:
+    app.config["ASSETS_FREEZE_CONFIG"] = True
+    env = QuartAssets(app)
+
+    async def _serve() -> None:
+        async with app.test_app():  # ty: ignore[invalid-context-manager]
+            app.config["ASSETS_DEBUG"] = True
+            assert env.debug is False
+
+    asyncio.run(_serve())
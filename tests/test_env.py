@@ -1,10 +1,31 @@
+import asyncio
+import json
+import os
+import threading
+import time
 import types
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Any
 
+import pytest
+import webassets.bundle
+import webassets.merge
+import webassets.utils
+from jinja2 import Environment
 from quart import Quart
+from webassets.exceptions import BundleError
 
-from quart_assets import Bundle, QuartAssets
-from tests.conftest import run_with_context_async
+from quart_assets import (
+    AssetMetrics,
+    AsyncAssetsExtension,
+    Bundle,
+    extension,
+    QuartAssets,
+    QuartResolver,
+)
+from quart_assets.extension import _context_app, _output_lock
+from tests.conftest import run_with_context, run_with_context_async
 
 
 def test_assets_tag(app: Quart, env: QuartAssets) -> None:
@@ -14,6 +35,30 @@ def test_assets_tag(app: Quart, env: QuartAssets) -> None:
     assert result == "/app_static/file1;/app_static/file2;"
 
 
+def test_assets_tag_unbound_app(app: Quart, no_app_env: QuartAssets, monkeypatch: Any) -> None:
+    no_app_env.init_app(app)
+    no_app_env.register("test", "file1", "file2")
+    template = app.jinja_env.from_string("{% assets 'test' %}{{ASSET_URL}};{% endassets %}")
+
+    lookups = []
+    original = extension.has_app_context
+
+    def counting_has_app_context() -> bool:
+        lookups.append(None)
+        return original()
+
+    monkeypatch.setattr(extension, "has_app_context", counting_has_app_context)
+
+    async def render() -> str:
+        async with app.app_context():  # ty: ignore[invalid-context-manager]
+            return await template.render_async()
+
+    assert asyncio.run(render()) == "/app_static/file1;/app_static/file2;"
+    # The app is looked up once for the tag, rather than on every access.
+    assert len(lookups) == 1
+    assert _context_app.get() is None
+
+
 def test_from_module(app: Quart, env: QuartAssets) -> None:
     module = types.ModuleType("test")
     setattr(module, "pytest", Bundle("py_file1", "py_file2"))
@@ -38,3 +83,453 @@ def test_from_yaml(app: Quart, env: QuartAssets, tmp_path: Path) -> None:
     template = app.jinja_env.from_string('{% assets "yaml_test" %}{{ASSET_URL}};{% endassets %}')
     result = run_with_context_async(app, lambda: template.render_async())
     assert result == "/app_static/yaml_file1;/app_static/yaml_file2;"
+    assert isinstance(env["yaml_test"], Bundle)
+
+
+def test_register_creates_bundles(env: QuartAssets) -> None:
+    """Bundles registered from sources build the Quart-Assets way, while
+    webassets itself is left alone."""
+    env.register("js", "file1", "file2", output="out.js")
+    assert isinstance(env["js"], Bundle)
+    assert webassets.bundle.FilterTool is webassets.merge.FilterTool
+    assert webassets.bundle.merge is webassets.merge.merge
+    assert webassets.bundle.calculate_sri_on_file is webassets.utils.calculate_sri_on_file
+    assert webassets.bundle.Bundle._build is not Bundle._build
+
+
+def test_assets_tag_render_cache(app: Quart, env: QuartAssets, monkeypatch: Any) -> None:
+    env.register("test", "file1", "file2")
+    env.auto_build = False
+    template = app.jinja_env.from_string("{% assets 'test' %}{{ASSET_URL}};{% endassets %}")
+
+    calls = []
+    original_urls = Bundle.urls
+
+    def counting_urls(self: Bundle, *args: Any, **kwargs: Any) -> Any:
+        calls.append(self)
+        return original_urls(self, *args, **kwargs)
+
+    monkeypatch.setattr(Bundle, "urls", counting_urls)
+
+    for _ in range(3):
+        result = run_with_context_async(app, lambda: template.render_async())
+        assert result == "/app_static/file1;/app_static/file2;"
+    assert len(calls) == 1
+
+    env.clear_render_cache()
+    run_with_context_async(app, lambda: template.render_async())
+    assert len(calls) == 2
+
+
+def test_assets_tag_named_bundle(app: Quart, env: QuartAssets, monkeypatch: Any) -> None:
+    """Tags naming a single registered bundle use it rather than wrapping it."""
+    env.register("test", Bundle("file1", "file2", extra={"media": "print"}))
+    template = app.jinja_env.from_string(
+        "{% assets 'test' %}{{ASSET_URL}} {{EXTRA.media}};{% endassets %}"
+    )
+
+    def no_bundle(*args: Any, **kwargs: Any) -> Any:
+        raise AssertionError("A bundle was created")
+
+    monkeypatch.setattr(AsyncAssetsExtension, "BundleClass", no_bundle)
+    for _ in range(2):
+        result = run_with_context_async(app, lambda: template.render_async())
+        assert result == "/app_static/file1 print;/app_static/file2 print;"
+
+    template = app.jinja_env.from_string(
+        "{% assets 'test', output='x' %}{{ASSET_URL}}{% endassets %}"
+    )
+    with pytest.raises(AssertionError, match="A bundle was created"):
+        run_with_context_async(app, lambda: template.render_async())
+
+
+def test_assets_tag_precompiled(app: Quart, env: QuartAssets, monkeypatch: Any) -> None:
+    """Tags with literal arguments are resolved when the template is compiled."""
+    env.register("test", Bundle("file1", "file2", extra={"media": "print"}))
+    env.auto_build = False
+    env.precompile_tags = True
+
+    async def compile_and_render(source: str) -> str:
+        async with app.app_context():  # ty: ignore[invalid-context-manager]
+            template = app.jinja_env.from_string(source)
+        monkeypatch.setattr(AsyncAssetsExtension, "_build_bundle", None)
+        try:
+            async with app.test_request_context("/"):  # ty: ignore[invalid-context-manager]
+                return await template.render_async(name="test")
+        finally:
+            monkeypatch.undo()
+
+    result = asyncio.run(
+        compile_and_render("{% assets 'test' %}{{ASSET_URL}} {{EXTRA.media}};{% endassets %}")
+    )
+    assert result == "/app_static/file1 print;/app_static/file2 print;"
+    result = asyncio.run(
+        compile_and_render(
+            "{% assets_many 'test', 'file3' %}{% set x = ASSET_URL %}{{x}};{% endassets_many %}"
+        )
+    )
+    assert result == "/app_static/file1;/app_static/file2;/app_static/file3;"
+
+    # Tags with arguments only known when rendering are rendered as usual.
+    with pytest.raises(TypeError):
+        asyncio.run(compile_and_render("{% assets name %}{{ASSET_URL}}{% endassets %}"))
+
+
+def test_assets_tag_precompiled_once_built(
+    app: Quart, env: QuartAssets, tmp_path: Path, monkeypatch: Any
+) -> None:
+    """Tags are only resolved when compiling once their outputs are built."""
+    app.static_folder = str(tmp_path)
+    (tmp_path / "file1").write_text("a", encoding="utf-8")
+    env.register("test", Bundle("file1", output="out.css"))
+    env.auto_build = False
+    env.url_expire = False
+    env.precompile_tags = True
+
+    def compile_template() -> Any:
+        async def _compile() -> Any:
+            async with app.app_context():  # ty: ignore[invalid-context-manager]
+                return app.jinja_env.from_string(
+                    "{% assets 'test' %}{{ASSET_URL}} {{ASSET_SRI}}{% endassets %}"
+                )
+
+        return asyncio.run(_compile())
+
+    template = compile_template()
+    calls = []
+    original_build_bundle = AsyncAssetsExtension._build_bundle
+
+    def counting_build_bundle(self: Any, *args: Any, **kwargs: Any) -> Any:
+        calls.append(args)
+        return original_build_bundle(self, *args, **kwargs)
+
+    monkeypatch.setattr(AsyncAssetsExtension, "_build_bundle", counting_build_bundle)
+    assert run_with_context_async(app, template.render_async) == "/app_static/out.css None"
+    assert len(calls) == 1
+
+    env["test"].build()
+    env.clear_render_cache()
+    template = compile_template()
+    calls.clear()
+    result = run_with_context_async(app, template.render_async)
+    assert result.startswith("/app_static/out.css sha384-")
+    assert not calls
+
+
+def test_assets_tag_render_cache_bypassed(app: Quart, env: QuartAssets, monkeypatch: Any) -> None:
+    """With auto_build or debug enabled the cache is not used."""
+    env.register("test", "file1")
+    template = app.jinja_env.from_string("{% assets 'test' %}{{ASSET_URL}};{% endassets %}")
+
+    calls = []
+    original_urls = Bundle.urls
+
+    def counting_urls(self: Bundle, *args: Any, **kwargs: Any) -> Any:
+        calls.append(self)
+        return original_urls(self, *args, **kwargs)
+
+    monkeypatch.setattr(Bundle, "urls", counting_urls)
+
+    assert env.auto_build
+    run_with_context_async(app, lambda: template.render_async())
+    run_with_context_async(app, lambda: template.render_async())
+    assert len(calls) == 2
+
+    env.auto_build = False
+    env.debug = True
+    run_with_context_async(app, lambda: template.render_async())
+    run_with_context_async(app, lambda: template.render_async())
+    assert len(calls) == 4
+
+
+def test_assets_tag_builds_off_event_loop(app: Quart, env: QuartAssets, monkeypatch: Any) -> None:
+    """Concurrent renders of a stale bundle share one build in a worker thread."""
+    env.register("test", "file1")
+    template = app.jinja_env.from_string("{% assets 'test' %}{{ASSET_URL}};{% endassets %}")
+
+    threads = []
+
+    def slow_build(self: Any, *args: Any) -> Any:
+        threads.append(threading.current_thread())
+        time.sleep(0.05)
+        return {}, ["/app_static/built"]
+
+    monkeypatch.setattr(AsyncAssetsExtension, "_build_bundle", slow_build)
+
+    async def render_many() -> list[str]:
+        return await asyncio.gather(*(template.render_async() for _ in range(5)))
+
+    results = run_with_context_async(app, render_many)
+    assert results == ["/app_static/built;"] * 5
+    assert len(threads) == 1
+    assert threads[0] is not threading.main_thread()
+    assert not env._pending_builds
+
+
+def test_assets_tag_builds_output_once(app: Quart, env: QuartAssets, monkeypatch: Any) -> None:
+    """Different tags building the same output do not build it concurrently."""
+    templates = [
+        app.jinja_env.from_string(source)
+        for source in (
+            "{% assets 'file1', output='out.css' %}{{ASSET_URL}};{% endassets %}",
+            "{% assets 'file1', output='./out.css' %}{{ASSET_URL}};{% endassets %}",
+            "{% assets 'file1', output='out.css' %}{{ASSET_SRI}};{% endassets %}",
+        )
+    ]
+
+    running = []
+    overlaps = []
+
+    def slow_build(self: Any, *args: Any) -> Any:
+        overlaps.append(bool(running))
+        running.append(None)
+        time.sleep(0.02)
+        running.pop()
+        return {}, [{"uri": "/app_static/out.css", "sri": None}]
+
+    monkeypatch.setattr(AsyncAssetsExtension, "_build_bundle", slow_build)
+
+    async def render_many() -> list[str]:
+        return await asyncio.gather(*(template.render_async() for template in templates))
+
+    run_with_context_async(app, render_many)
+    assert len(overlaps) == 3
+    assert not any(overlaps)
+    assert not env._pending_builds
+
+
+def test_assets_tag_build_executor_disabled(app: Quart, env: QuartAssets, monkeypatch: Any) -> None:
+    env.register("test", "file1")
+    env.build_executor = None
+    template = app.jinja_env.from_string("{% assets 'test' %}{{ASSET_URL}};{% endassets %}")
+
+    threads = []
+    original = AsyncAssetsExtension._build_bundle
+
+    def recording_build(self: Any, *args: Any) -> Any:
+        threads.append(threading.current_thread())
+        return original(self, *args)
+
+    monkeypatch.setattr(AsyncAssetsExtension, "_build_bundle", recording_build)
+
+    result = run_with_context_async(app, lambda: template.render_async())
+    assert result == "/app_static/file1;"
+    assert threads == [threading.main_thread()]
+
+
+def test_process_pool_build_executor_rejected(app: Quart, env: QuartAssets) -> None:
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        env.build_executor = executor
+        with pytest.raises(ValueError):
+            env._get_build_executor()
+
+
+def test_assets_tag_from_url_manifest(app: Quart, tmp_path: Path) -> None:
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text(
+        json.dumps(
+            {
+                "version": 1,
+                "bundles": {
+                    "css": {
+                        "extra": {"media": "print"},
+                        "urls": [{"url": "/app_static/all.css?v1", "sri": "sha384-x", "size": 3}],
+                    }
+                },
+            }
+        ),
+        encoding="utf-8",
+    )
+    app.config["ASSETS_URL_MANIFEST"] = str(manifest_path)
+    env = QuartAssets(app)
+    # Registered bundles are not consulted once a manifest is loaded.
+    env.register("css", "missing.css", output="all.css")
+
+    template = app.jinja_env.from_string(
+        "{% assets 'css' %}{{ASSET_URL}} {{ASSET_SRI}} {{EXTRA.media}}{% endassets %}"
+    )
+    result = run_with_context_async(app, lambda: template.render_async())
+    assert result == "/app_static/all.css?v1 sha384-x print"
+
+    template = app.jinja_env.from_string("{% assets 'js' %}{{ASSET_URL}}{% endassets %}")
+    with pytest.raises(BundleError):
+        run_with_context_async(app, lambda: template.render_async())
+
+
+def test_assets_many_tag(app: Quart, env: QuartAssets, monkeypatch: Any) -> None:
+    env.register("a", "file1", "shared")
+    env.register("b", "shared", "file2")
+    template = app.jinja_env.from_string(
+        "{% assets_many 'a', 'b', ['file3'] %}{{ASSET_URL}};{% endassets_many %}"
+    )
+
+    searches = []
+    original = QuartResolver._search_for_source
+
+    def counting_search(self: QuartResolver, ctx: Any, item: str) -> Any:
+        searches.append(item)
+        return original(self, ctx, item)
+
+    monkeypatch.setattr(QuartResolver, "_search_for_source", counting_search)
+
+    result = run_with_context_async(app, lambda: template.render_async())
+    # URLs shared by several bundles are emitted once.
+    assert result == "/app_static/file1;/app_static/shared;/app_static/file2;/app_static/file3;"
+    assert sorted(searches) == ["file1", "file2", "file3", "shared"]
+
+    jinja_env = Environment(extensions=[AsyncAssetsExtension])
+    jinja_env.assets_environment = env  # ty: ignore[unresolved-attribute]
+    template = jinja_env.from_string("{% assets_many 'b', 'a' %}{{ASSET_URL}};{% endassets_many %}")
+    result = run_with_context(app, lambda: template.render())
+    assert result == "/app_static/shared;/app_static/file2;/app_static/file1;"
+
+    urls = run_with_context(app, lambda: env.urls_for(["a", "b"]))
+    assert urls == ["/app_static/file1", "/app_static/shared", "/app_static/file2"]
+
+
+def test_assets_tag_sri_cache(app: Quart, env: QuartAssets, tmp_path: Path) -> None:
+    """SRI hashes are cached until the output changes."""
+    app.static_folder = str(tmp_path)
+    (tmp_path / "file1").write_text("a", encoding="utf-8")
+    env.register("test", Bundle("file1", output="out.css"))
+    template = app.jinja_env.from_string("{% assets 'test' %}{{ASSET_SRI}}{% endassets %}")
+
+    results = {run_with_context_async(app, lambda: template.render_async()) for _ in range(3)}
+    (sri,) = results
+    assert sri.startswith("sha384-")
+    assert env._sri_for_stat.cache_info().misses == 1
+
+    (tmp_path / "file1").write_text("ab", encoding="utf-8")
+    env["test"].build(force=True)
+    assert run_with_context_async(app, lambda: template.render_async()) != sri
+    assert env._sri_for_stat.cache_info().misses == 2
+
+
+def test_assets_tag_sri_debug(app: Quart, env: QuartAssets, tmp_path: Path) -> None:
+    """In debug mode, each source URL gets the hash webassets would compute."""
+    app.static_folder = str(tmp_path)
+    (tmp_path / "file1").write_text("a", encoding="utf-8")
+    (tmp_path / "file2").write_text("b", encoding="utf-8")
+    bundle = Bundle("file1", Bundle("file2"), "http://example.com/x.js", output="out.css")
+    env.register("test", bundle)
+    env.debug = True
+    template = app.jinja_env.from_string(
+        "{% assets 'test' %}{{ASSET_URL}} {{ASSET_SRI}};{% endassets %}"
+    )
+
+    result = run_with_context_async(app, lambda: template.render_async())
+    expected = run_with_context(app, lambda: bundle.urls(calculate_sri=True))
+    assert result == "".join(f"{entry['uri']} {entry['sri']};" for entry in expected)
+    assert result.count("sha384-") == 2
+
+
+def test_assets_tag_skips_unused_sri(app: Quart, env: QuartAssets, tmp_path: Path) -> None:
+    """Tags not using ASSET_SRI, or environments with SRI disabled, skip hashing."""
+    app.static_folder = str(tmp_path)
+    (tmp_path / "file1").write_text("a", encoding="utf-8")
+    env.register("test", Bundle("file1", output="out.css"))
+
+    template = app.jinja_env.from_string("{% assets 'test' %}{{ASSET_URL}}{% endassets %}")
+    assert run_with_context_async(app, lambda: template.render_async()).startswith("/app_static/")
+
+    env.sri = False
+    template = app.jinja_env.from_string("{% assets 'test' %}{{ASSET_SRI}}{% endassets %}")
+    assert run_with_context_async(app, lambda: template.render_async()) == "None"
+    assert env._sri_for_stat.cache_info().currsize == 0
+
+
+def test_build_lock(app: Quart, env: QuartAssets, tmp_path: Path) -> None:
+    """Builds of the same output wait for each other, or use the stale output."""
+    app.static_folder = str(tmp_path)
+    (tmp_path / "file1").write_text("new", encoding="utf-8")
+    output = tmp_path / "out.css"
+    output.write_text("old", encoding="utf-8")
+    os.utime(output, (0, 0))
+    env.register("test", Bundle("file1", output="out.css"))
+    env.manifest = False
+
+    with _output_lock(str(output)):
+        env.build_lock = "stale"
+        env["test"].build()
+        assert output.read_text(encoding="utf-8") == "old"
+
+        env.build_lock = "wait"
+        builder = threading.Thread(target=env["test"].build)
+        builder.start()
+        builder.join(0.2)
+        assert builder.is_alive()
+    builder.join(5)
+    assert output.read_text(encoding="utf-8") == "new"
+    assert not list(tmp_path.glob(".*.lock"))
+
+    # An up to date output is used without taking the lock.
+    with _output_lock(str(output)):
+        builder = threading.Thread(target=env["test"].build)
+        builder.start()
+        builder.join(5)
+        assert not builder.is_alive()
+
+
+def test_build_lock_file(tmp_path: Path) -> None:
+    """Lock files are private, removed on release and never followed as links."""
+    lock_file = tmp_path / ".out.css.lock"
+    with _output_lock(str(tmp_path / "out.css")):
+        assert lock_file.stat().st_mode & 0o777 == 0o600
+        with _output_lock(str(tmp_path / "out.css"), blocking=False) as locked:
+            assert not locked
+    assert not lock_file.exists()
+
+    lock_file.symlink_to(tmp_path / "target")
+    with pytest.raises(OSError):
+        with _output_lock(str(tmp_path / "out.css")):
+            pass
+    assert not (tmp_path / "target").exists()
+
+
+def test_warmup(app: Quart, tmp_path: Path, caplog: Any) -> None:
+    """Bundles are built and their URLs cached before the app serves."""
+    app.static_folder = str(tmp_path)
+    app.config["ASSETS_WARMUP"] = True
+    app.config["ASSETS_AUTO_BUILD"] = False
+    (tmp_path / "file1").write_text("a", encoding="utf-8")
+    env = QuartAssets(app)
+    env.register("test", Bundle("file1", output="out.css"))
+    env.register("missing", Bundle("missing", output="missing.css"))
+
+    async def _serve() -> None:
+        async with app.test_app():  # ty: ignore[invalid-context-manager]
+            pass
+
+    with caplog.at_level("INFO"):
+        asyncio.run(_serve())
+    assert (tmp_path / "out.css").exists()
+    assert "Warmed up bundle test" in caplog.text
+    assert "Failed to warm up bundle missing" in caplog.text
+    cache = env._get_render_cache()
+    ((_, with_sri),) = [v for k, v in cache.items() if k[-1]]
+    assert with_sri[0]["sri"].startswith("sha384-")
+    assert len(cache) == 2
+
+
+def test_metrics_hooks(app: Quart, env: QuartAssets, tmp_path: Path) -> None:
+    app.static_folder = str(tmp_path)
+    (tmp_path / "file1").write_text("a", encoding="utf-8")
+    env.register("test", Bundle("file1", output="out.css"))
+    metrics = AssetMetrics()
+    events: list[tuple[str, str, float]] = []
+    env.add_metrics_hook(metrics)
+    env.add_metrics_hook(lambda *event: events.append(event))
+
+    template = app.jinja_env.from_string("{% assets 'test' %}{{ASSET_SRI}}{% endassets %}")
+    run_with_context_async(app, lambda: template.render_async())
+    operations = {operation for operation, _, _ in events}
+    assert {"render", "build", "resolve", "url", "sri"} <= operations
+    assert {row["operation"] for row in metrics.hot_spots()} == operations
+    assert 'quart_assets_operation_seconds_count{operation="render",label="test"} 1' in (
+        metrics.prometheus()
+    )
+
+    env.remove_metrics_hook(metrics)
+    metrics.reset()
+    run_with_context_async(app, lambda: template.render_async())
+    assert metrics.hot_spots() == []
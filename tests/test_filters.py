@@ -0,0 +1,174 @@
+import asyncio
+import os
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+from quart import Quart, template_rendered
+from webassets.exceptions import BuildError
+
+from quart_assets import AsyncFilter, Bundle, ChunkedFilter, Jinja2Filter, QuartAssets
+from tests.conftest import run_with_context, run_with_context_async
+
+
+class UpperFilter(AsyncFilter):
+    name = "test_upper"
+
+    def __init__(self, barrier: threading.Barrier | None = None) -> None:
+        super().__init__()
+        self.barrier = barrier
+
+    async def input_async(self, _in: Any, out: Any, **kw: Any) -> None:
+        if self.barrier is not None:
+            # Only passes if all sources are being filtered at the same time.
+            await asyncio.to_thread(self.barrier.wait)
+        out.write(await self.run_in_process(str.upper, _in.read()))
+
+
+class SuffixFilter(AsyncFilter):
+    name = "test_suffix"
+
+    async def output_async(self, _in: Any, out: Any, **kw: Any) -> None:
+        out.write(_in.read() + ";")
+
+
+class ChunkRecorder(ChunkedFilter):
+    name = "test_chunks"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.chunks: list[str] = []
+
+    def output_chunks(self, chunks: Iterator[str], **kw: Any) -> Iterator[str]:
+        for chunk in chunks:
+            self.chunks.append(chunk)
+            yield chunk.upper()
+
+
+def _write_sources(tmp_path: Path) -> None:
+    (tmp_path / "a.js").write_text("a", encoding="utf-8")
+    (tmp_path / "b.js").write_text("b", encoding="utf-8")
+    (tmp_path / "c.js").write_text("c", encoding="utf-8")
+
+
+def test_async_filter_steps(app: Quart, env: QuartAssets, tmp_path: Path) -> None:
+    """Only the steps an async filter implements are run."""
+    app.static_folder = str(tmp_path)
+    _write_sources(tmp_path)
+    assert not hasattr(SuffixFilter, "input")
+    bundle = Bundle("a.js", "b.js", filters=[UpperFilter(), SuffixFilter()], output="out.js")
+    env.register("test", bundle)
+
+    run_with_context_async(app, lambda: asyncio.to_thread(bundle.build, force=True))
+    assert (tmp_path / "out.js").read_text(encoding="utf-8") == "A\nB;"
+
+
+def test_async_filter_on_event_loop(app: Quart, env: QuartAssets, tmp_path: Path) -> None:
+    """Async filters refuse to block the event loop they would run on."""
+    app.static_folder = str(tmp_path)
+    _write_sources(tmp_path)
+    bundle = Bundle("a.js", filters=SuffixFilter(), output="out.js")
+    env.register("test", bundle)
+
+    with pytest.raises(BuildError, match="event loop"):
+        run_with_context(app, lambda: bundle.build(force=True))
+
+
+def test_async_filter_inputs_run_concurrently(app: Quart, env: QuartAssets, tmp_path: Path) -> None:
+    app.static_folder = str(tmp_path)
+    _write_sources(tmp_path)
+    barrier = threading.Barrier(3, timeout=5)
+    bundle = Bundle("a.js", "b.js", "c.js", filters=UpperFilter(barrier), output="out.js")
+    env.register("test", bundle)
+
+    bundle.build(force=True)
+    assert (tmp_path / "out.js").read_text(encoding="utf-8") == "A\nB\nC"
+
+
+def test_jinja2_filter(app: Quart, env: QuartAssets, tmp_path: Path) -> None:
+    """Sources are rendered as Quart templates."""
+    app.static_folder = str(tmp_path)
+    (tmp_path / "a.js").write_text("var {{ name }} = '{{ config.TESTING }}';", encoding="utf-8")
+    app.config["TESTING"] = True
+    bundle = Bundle("a.js", filters=Jinja2Filter({"name": "x"}), output="out.js")
+    env.register("test", bundle)
+    rendered = []
+
+    def record(sender: Quart, template: Any, context: dict[str, Any]) -> None:
+        rendered.append(context["name"])
+
+    with template_rendered.connected_to(record, app):
+        run_with_context(app, lambda: bundle.build(force=True))
+    assert (tmp_path / "out.js").read_text(encoding="utf-8") == "var x = 'True';"
+    assert rendered == ["x"]
+
+
+def test_jinja2_filter_template_cache(
+    app: Quart, env: QuartAssets, tmp_path: Path, monkeypatch: Any
+) -> None:
+    """Only new or changed sources are compiled again."""
+    app.static_folder = str(tmp_path)
+    monkeypatch.setattr(Jinja2Filter, "template_cache_size", 2)
+    # Compile the sources in order, so which template is evicted is known.
+    monkeypatch.setattr(Jinja2Filter, "concurrent", False)
+    Jinja2Filter.clear_template_cache()
+    compiled: list[str] = []
+    from_string = app.jinja_env.from_string
+
+    def recording_from_string(source: str, *args: Any, **kwargs: Any) -> Any:
+        compiled.append(source)
+        return from_string(source, *args, **kwargs)
+
+    monkeypatch.setattr(app.jinja_env, "from_string", recording_from_string)
+    (tmp_path / "a.js").write_text("{{ 1 + 1 }}", encoding="utf-8")
+    (tmp_path / "b.js").write_text("{{ 2 + 2 }}", encoding="utf-8")
+    bundle = Bundle("a.js", "b.js", filters=Jinja2Filter(), output="out.js")
+    env.register("test", bundle)
+    env.cache = False
+    env.manifest = False
+
+    def build() -> Any:
+        return asyncio.to_thread(bundle.build, force=True)
+
+    run_with_context_async(app, build)
+    run_with_context_async(app, build)
+    assert sorted(compiled) == ["{{ 1 + 1 }}", "{{ 2 + 2 }}"]
+
+    (tmp_path / "b.js").write_text("{{ 3 + 3 }}", encoding="utf-8")
+    run_with_context_async(app, build)
+    assert compiled[2:] == ["{{ 3 + 3 }}"]
+    assert (tmp_path / "out.js").read_text(encoding="utf-8") == "2\n6"
+    # The least recently used template was evicted beyond the cache size.
+    assert len(Jinja2Filter._templates[app.jinja_env]) == 2
+
+
+def test_streaming_build(app: Quart, env: QuartAssets, tmp_path: Path, monkeypatch: Any) -> None:
+    """Streaming builds pass content through chunked filters piece by piece."""
+    app.static_folder = str(tmp_path)
+    (tmp_path / "a.js").write_text("a" * 10, encoding="utf-8")
+    (tmp_path / "b.js").write_text("b" * 3, encoding="utf-8")
+    recorder = ChunkRecorder()
+    bundle = Bundle("a.js", "b.js", filters=recorder, output="out.js")
+    env.register("test", bundle)
+    env.cache = False
+    env.manifest = False
+
+    bundle.build(force=True)
+    assert recorder.chunks == ["a" * 10 + "\n" + "b" * 3]
+
+    version = bundle.version
+    env.streaming = True
+    monkeypatch.setattr(env, "stream_chunk_size", 4)
+    recorder.chunks.clear()
+    bundle.build(force=True)
+    # Generated once for the hash version, and once for the output.
+    assert recorder.chunks == ["aaaa", "aaaa", "aa", "\n", "bbb"] * 2
+    assert bundle.version == version
+    output = tmp_path / "out.js"
+    assert output.read_text(encoding="utf-8") == "A" * 10 + "\n" + "B" * 3
+    umask = os.umask(0o022)
+    os.umask(umask)
+    assert output.stat().st_mode & 0o777 == 0o666 & ~umask
+    assert not list(tmp_path.glob("*.tmp"))
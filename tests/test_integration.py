@@ -1,8 +1,10 @@
 import os
+from typing import Any
 
 import pytest
 from quart import Quart
 from webassets.bundle import get_all_bundle_files
+from webassets.env import Resolver
 
 from quart_assets import Bundle, QuartAssets
 from tests.conftest import run_with_context
@@ -93,6 +95,7 @@ def test_custom_load_path(app: Quart, env: QuartAssets, temp_dir: str) -> None:
     # [Regression] With a load path configured, generating output
     # urls still works, and it still uses the Quart system.
     env.debug = False
+    env.auto_build = False
     env.url_expire = False
     result3 = run_with_context(app, get_foo_output_urls)
     assert result3 == ["/app_static/out"]
@@ -313,10 +316,88 @@ def test_cssrewrite(app: Quart, env: QuartAssets, temp_dir: str) -> None:
         f.write('h1{background: url("local")}')
 
     # Source file is in a blueprint, output file is app-level.
+    app.static_folder = temp_dir
     Bundle("bp3/css", filters="cssrewrite", output="out", env=env).build()
 
     # The urls are NOT rewritten using the filesystem, but
     # within the url space.
-    static_folder = app.static_folder or ""
-    with open(os.path.join(static_folder, "out"), "r") as f:
+    with open(os.path.join(temp_dir, "out"), "r") as f:
         assert f.read() == 'h1{background: url("../w/u/f/f/local")}'
+
+
+def test_blueprint_registered_after_resolution(app: Quart, env: QuartAssets, temp_dir: str) -> None:
+    """Cached blueprint prefixes pick up blueprints registered later on."""
+    assert get_all_bundle_files(Bundle("bp4/foo"), env) == [
+        app.root_path + os.path.normpath("/static/bp4/foo")
+    ]
+
+    app.register_blueprint(new_blueprint("bp4", static_folder=temp_dir))
+    assert get_all_bundle_files(Bundle("bp4/foo"), env) == [os.path.join(temp_dir, "foo")]
+
+    app.static_folder = temp_dir
+    env.resolver.clear_prefix_cache(app)
+    assert get_all_bundle_files(Bundle("foo"), env) == [os.path.join(temp_dir, "foo")]
+
+
+def test_urls_outside_request_context(app: Quart, env: QuartAssets, temp_dir: str) -> None:
+    """URLs built without a request context follow URL map changes."""
+    assert Bundle("bp5/foo", env=env).urls() == ["/app_static/bp5/foo"]
+    assert Bundle("bp5/foo", env=env).urls() == ["/app_static/bp5/foo"]
+
+    app.register_blueprint(
+        new_blueprint("bp5", static_folder=temp_dir, static_url_path="/bp5_static")
+    )
+    assert Bundle("bp5/foo", env=env).urls() == ["/bp5_static/foo"]
+
+    app.config["SERVER_NAME"] = "assets.example.com"
+    assert Bundle("bp5/foo", env=env).urls() == ["/bp5_static/foo"]
+    url_adapter, urls = env.resolver._get_url_table(app)
+    assert url_adapter.server_name == "assets.example.com"
+
+    app.add_url_rule("/late/<path:filename>", "late", lambda filename: filename)
+    assert env.resolver._get_url_table(app)[0] is url_adapter
+    assert env.resolver._get_url_table(app)[1] is not urls
+
+    env.resolver.url_cache_size = 2
+    assert Bundle("a", "b", "c", env=env).urls() == [
+        "/app_static/a",
+        "/app_static/b",
+        "/app_static/c",
+    ]
+    assert list(env.resolver._get_url_table(app)[1]) == [("static", "b"), ("static", "c")]
+    assert Bundle("b", "d", env=env).urls() == ["/app_static/b", "/app_static/d"]
+    assert list(env.resolver._get_url_table(app)[1]) == [("static", "b"), ("static", "d")]
+
+
+def test_glob_directory_index(
+    app: Quart, env: QuartAssets, temp_dir: str, monkeypatch: Any
+) -> None:
+    """Globs are expanded from cached directory listings, as webassets would."""
+    for name in ("a.js", "b.css", ".hidden.js", "sub/c.js", "sub/deeper/d.js", "dir.js/e.js"):
+        os.makedirs(os.path.dirname(os.path.join(temp_dir, name)), exist_ok=True)
+        with open(os.path.join(temp_dir, name), "w", encoding="utf-8") as f:
+            f.write(name)
+
+    resolver = env.resolver
+    for expr in ("*.js", ".*", "*", "*/*.js", "**/*.js", "sub/*/d.js", "s?b/c.js", "none/*"):
+        assert resolver.glob(temp_dir, expr) == Resolver.glob(resolver, temp_dir, expr), expr
+
+    scans = []
+    original_scandir = os.scandir
+
+    def counting_scandir(directory: Any) -> Any:
+        scans.append(directory)
+        return original_scandir(directory)
+
+    monkeypatch.setattr(os, "scandir", counting_scandir)
+    assert resolver.glob(temp_dir, "sub/*.js") == [os.path.join(temp_dir, "sub", "c.js")]
+    assert scans == []
+
+    with open(os.path.join(temp_dir, "sub", "f.js"), "w", encoding="utf-8") as f:
+        f.write("f")
+    # Only the directory which changed is scanned again.
+    assert resolver.glob(temp_dir, "sub/*.js") == [
+        os.path.join(temp_dir, "sub", "c.js"),
+        os.path.join(temp_dir, "sub", "f.js"),
+    ]
+    assert scans == [os.path.join(temp_dir, "sub")]
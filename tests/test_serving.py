@@ -0,0 +1,230 @@
+import asyncio
+import gzip
+import os
+from typing import Any
+
+import pytest
+from quart import Quart
+from werkzeug.datastructures import Headers
+
+from quart_assets import Bundle, QuartAssets
+
+CONTENTS = "body { color: red; }\n" * 100
+
+
+@pytest.fixture
+def served_app(temp_dir: str) -> Quart:
+    """An app serving a built bundle from memory."""
+    app = Quart(__name__, static_folder=temp_dir, static_url_path="/static")
+    app.config["ASSETS_SERVE_FROM_MEMORY"] = True
+    with open(os.path.join(temp_dir, "main.css"), "w", encoding="utf-8") as f:
+        f.write(CONTENTS)
+    with open(os.path.join(temp_dir, "plain.txt"), "w", encoding="utf-8") as f:
+        f.write("not a bundle")
+
+    env = QuartAssets(app)
+    env.auto_build = False
+    env.register("css", Bundle("main.css", output="packed.css"))
+    env["css"].build()
+    return app
+
+
+def _get(app: Quart, url: str, headers: dict[str, str] | None = None) -> tuple[int, Headers, bytes]:
+    async def _run() -> tuple[int, Headers, bytes]:
+        response = await app.test_client().get(url, headers=headers)
+        return response.status_code, response.headers, await response.get_data(as_text=False)
+
+    return asyncio.run(_run())
+
+
+def test_serves_bundle_from_memory(served_app: Quart, temp_dir: str) -> None:
+    status, headers, body = _get(served_app, "/static/packed.css?abc123")
+    assert status == 200
+    assert body.decode() == CONTENTS
+    assert headers["Content-Type"].startswith("text/css")
+    assert "Content-Encoding" not in headers
+    assert headers["Vary"] == "Accept-Encoding"
+    assert "immutable" in headers["Cache-Control"]
+
+    # Served from memory, even once the file is gone.
+    os.unlink(os.path.join(temp_dir, "packed.css"))
+    assert _get(served_app, "/static/packed.css?abc123")[2] == body
+
+
+def test_negotiates_encoding(served_app: Quart) -> None:
+    status, headers, body = _get(
+        served_app, "/static/packed.css", {"Accept-Encoding": "gzip, deflate"}
+    )
+    assert status == 200
+    assert headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(body).decode() == CONTENTS
+    # Unversioned URLs have to be revalidated.
+    assert headers["Cache-Control"] == "no-cache"
+
+
+@pytest.mark.parametrize(
+    "accept,expected",
+    [
+        ("gzip;q=0.5", "gzip"),
+        ("gzip;q=0.5, identity;q=0.8", None),
+        ("gzip;q=0, br;q=0, *", None),
+        ("*;q=0.1, br;q=0", "gzip"),
+        ("", None),
+    ],
+)
+def test_negotiates_quality(served_app: Quart, accept: str, expected: str | None) -> None:
+    """Encodings are chosen by quality, identity only when nothing is preferred."""
+    status, headers, _ = _get(served_app, "/static/packed.css", {"Accept-Encoding": accept})
+    assert status == 200
+    assert headers.get("Content-Encoding") == expected
+
+
+def test_refuses_unacceptable_encodings(served_app: Quart) -> None:
+    status, headers, _ = _get(
+        served_app, "/static/packed.css", {"Accept-Encoding": "gzip;q=0, identity;q=0"}
+    )
+    assert status == 406
+    assert headers["Vary"] == "Accept-Encoding"
+
+
+def test_compresses_when_building(served_app: Quart, temp_dir: str) -> None:
+    """Compressed copies are written by the build, not the first request."""
+    with open(os.path.join(temp_dir, "packed.css.gz"), "rb") as f:
+        assert gzip.decompress(f.read()).decode() == CONTENTS
+
+
+def test_negotiates_brotli(served_app: Quart) -> None:
+    brotli = pytest.importorskip("brotli")
+    _, headers, body = _get(served_app, "/static/packed.css", {"Accept-Encoding": "gzip, br"})
+    assert headers["Content-Encoding"] == "br"
+    assert brotli.decompress(body).decode() == CONTENTS
+
+
+def test_conditional_request(served_app: Quart) -> None:
+    _, headers, _ = _get(served_app, "/static/packed.css", {"Accept-Encoding": "gzip"})
+    etag = headers["ETag"]
+
+    status, _, body = _get(
+        served_app, "/static/packed.css", {"Accept-Encoding": "gzip", "If-None-Match": etag}
+    )
+    assert status == 304
+    assert body == b""
+
+    # Each encoding has its own entity tag.
+    status, _, _ = _get(served_app, "/static/packed.css", {"If-None-Match": etag})
+    assert status == 200
+
+
+def test_other_static_files_untouched(served_app: Quart) -> None:
+    status, headers, body = _get(served_app, "/static/plain.txt", {"Accept-Encoding": "gzip"})
+    assert status == 200
+    assert body == b"not a bundle"
+    assert "Vary" not in headers
+
+
+def test_reloads_rebuilt_output_when_auto_building(served_app: Quart, temp_dir: str) -> None:
+    env = served_app.jinja_env.assets_environment  # ty: ignore[unresolved-attribute]
+    env.auto_build = True
+    _, headers, _ = _get(served_app, "/static/packed.css")
+
+    with open(os.path.join(temp_dir, "main.css"), "w", encoding="utf-8") as f:
+        f.write("body { color: blue; }")
+    env["css"].build(force=True)
+
+    _, new_headers, body = _get(served_app, "/static/packed.css")
+    assert body == b"body { color: blue; }"
+    assert new_headers["ETag"] != headers["ETag"]
+
+
+def test_preload_links(temp_dir: str) -> None:
+    """Rendered stylesheets and scripts are preloaded, and hinted early next time."""
+    app = Quart(__name__, static_folder=temp_dir, static_url_path="/static")
+    app.config["ASSETS_PRELOAD"] = True
+    env = QuartAssets(app)
+    # Already enabled by the config, so this does not hint twice.
+    env.preload(app)
+    env.register("css", Bundle("main.css", output="packed.css"))
+    env.register("js", Bundle("main.js"))
+    env.url_expire = False
+    template = app.jinja_env.from_string(
+        "{% assets_many 'css', 'js' %}{{ ASSET_URL }}{% endassets_many %}"
+        "{% assets 'css' %}{{ ASSET_URL }}{% endassets %}"
+    )
+
+    @app.route("/")
+    async def index() -> str:
+        return await template.render_async()
+
+    for name in ("main.css", "main.js"):
+        with open(os.path.join(temp_dir, name), "w", encoding="utf-8") as f:
+            f.write("")
+
+    status, headers, _ = _get(app, "/")
+    assert status == 200
+    assert headers["Link"] == (
+        "</static/packed.css>; rel=preload; as=style, </static/main.js>; rel=preload; as=script"
+    )
+    assert "Link" not in _get(app, "/static/main.js")[1]
+
+    async def request_with_early_hints(url: str) -> list[Any]:
+        scope = {
+            "type": "http",
+            "http_version": "2",
+            "method": "GET",
+            "scheme": "https",
+            "path": url,
+            "raw_path": url.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"localhost")],
+            "client": ("127.0.0.1", 1234),
+            "server": ("localhost", 443),
+            "extensions": {"http.response.early_hint": {}},
+        }
+        sent: list[Any] = []
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+        done = asyncio.Event()
+
+        async def receive() -> dict[str, Any]:
+            if messages:
+                return messages.pop()
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: dict[str, Any]) -> None:
+            sent.append(message)
+            if message["type"] == "http.response.body" and not message["more_body"]:
+                done.set()
+
+        async with app.test_app():  # ty: ignore[invalid-context-manager]
+            await app(scope, receive, send)  # ty: ignore[invalid-argument-type]
+        return sent
+
+    sent = asyncio.run(request_with_early_hints("/"))
+    assert sent[0] == {
+        "type": "http.response.early_hint",
+        "links": [
+            b"</static/packed.css>; rel=preload; as=style",
+            b"</static/main.js>; rel=preload; as=script",
+        ],
+    }
+    assert sent[1]["type"] == "http.response.start"
+    # Endpoints which have not rendered any assets get no hints.
+    sent = asyncio.run(request_with_early_hints("/static/main.js"))
+    assert sent[0]["type"] == "http.response.start"
+
+
+def test_reloads_output_rebuilt_elsewhere(served_app: Quart, temp_dir: str) -> None:
+    """Without auto_build, an output rewritten by another process is picked up."""
+    _, headers, _ = _get(served_app, "/static/packed.css", {"Accept-Encoding": "gzip"})
+    output = os.path.join(temp_dir, "packed.css")
+    with open(output, "w", encoding="utf-8") as f:
+        f.write("body { color: blue; }")
+    stat = os.stat(output)
+    os.utime(output, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    # The compressed copy is older than the output now, so it is not used.
+    _, new_headers, body = _get(served_app, "/static/packed.css", {"Accept-Encoding": "gzip"})
+    assert body == b"body { color: blue; }"
+    assert "Content-Encoding" not in new_headers
+    assert new_headers["ETag"] != headers["ETag"]